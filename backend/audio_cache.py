@@ -0,0 +1,149 @@
+import hashlib
+import os
+import tempfile
+import threading
+import uuid
+
+TTS_CACHE_DIR = os.getenv("TTS_CACHE_DIR", os.path.join(tempfile.gettempdir(), "linguaflow-tts"))
+TTS_CACHE_MAX_BYTES = int(os.getenv("TTS_CACHE_MAX_MB", 512)) * 1024 * 1024
+
+
+def read_chunks(f, size=64 * 1024):
+    """Yield the rest of an open file in blocks, closing it when done or abandoned."""
+    try:
+        for block in iter(lambda: f.read(size), b""):
+            yield block
+    finally:
+        f.close()
+
+
+def make_key(text: str, lang_code: str, provider: str, voice: str) -> str:
+    raw = "\x1f".join([text.strip(), lang_code, provider, voice])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Content-addressed MP3 files on local disk, evicted least-recently-used first.
+
+    Files are written under a temporary name and renamed into place, so a
+    reader never sees a partial file. Hits bump the file's mtime, which is
+    what eviction orders by.
+    """
+
+    def __init__(self, directory=TTS_CACHE_DIR, max_bytes=TTS_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._size = None  # computed lazily from disk
+        self.stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def _files(self):
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".mp3"):
+                    yield os.path.join(root, name)
+
+    def _ensure_size(self):
+        if self._size is None:
+            self._size = sum(os.path.getsize(path) for path in self._files())
+
+    def get(self, key: str):
+        """Return the cached MP3 for `key` as an open binary file, or None. The caller closes it.
+
+        The file is opened here rather than handed out by path, since
+        eviction may remove it at any moment: an open file stays readable
+        after unlink on POSIX, and a file gone mid-lookup is just a miss.
+        """
+        path = self._path(key)
+        try:
+            f = open(path, "rb")
+        except OSError:
+            self.stats["misses"] += 1
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass  # evicted since the open; still servable
+        self.stats["hits"] += 1
+        return f
+
+    def put(self, key: str, data: bytes) -> str:
+        with self.writer(key) as sink:
+            sink.write(data)
+        return self._path(key)
+
+    def writer(self, key: str):
+        """File-like sink that is published under `key` only if the block completes without error."""
+        return _CacheWriter(self, key)
+
+    def _commit(self, key: str, temp_path: str, size: int):
+        path = self._path(key)
+        with self._lock:
+            # Sized before the replace, or the first walk would count the new file too
+            self._ensure_size()
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            os.replace(temp_path, path)
+            self._size += size - replaced
+            self.stats["stores"] += 1
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Called with the lock held; trims to 90% so eviction is not run on every write
+        target = int(self.max_bytes * 0.9)
+        entries = []
+        for path in self._files():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        entries.sort()
+        self._size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            self.stats["evictions"] += 1
+
+    def snapshot(self):
+        with self._lock:
+            size = self._size
+        return {**self.stats, "bytes": size}
+
+
+class _CacheWriter:
+    def __init__(self, cache: AudioCache, key: str):
+        self.cache = cache
+        self.key = key
+        self.size = 0
+
+    def __enter__(self):
+        directory = os.path.dirname(self.cache._path(self.key))
+        os.makedirs(directory, exist_ok=True)
+        self.temp_path = os.path.join(directory, f".{uuid.uuid4().hex}.part")
+        self.file = open(self.temp_path, "wb")
+        return self
+
+    def write(self, data: bytes):
+        self.file.write(data)
+        self.size += len(data)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.file.close()
+        if exc_type is None and self.size:
+            self.cache._commit(self.key, self.temp_path, self.size)
+        else:
+            # Failed or abandoned (e.g. the client disconnected mid-stream)
+            os.remove(self.temp_path)
+        return False
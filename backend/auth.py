@@ -1,5 +1,13 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
+import asyncio
+import logging
+import multiprocessing
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
@@ -12,8 +20,24 @@ load_dotenv(dotenv_path=env_path)
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+# Trust the user id embedded in tokens ("uid" claim) and skip the user lookup entirely.
+# A deleted user's token then stays valid until it expires.
+STATELESS_TOKENS = os.getenv("AUTH_STATELESS_TOKENS", "false").lower() in ("1", "true", "yes")
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", 60))
+PRINCIPAL_CACHE_MAX_ENTRIES = int(os.getenv("PRINCIPAL_CACHE_MAX_ENTRIES", 10000))
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", 12))
+# bcrypt is deliberately slow (~100-300 ms of CPU), so it runs on its own
+# bounded pool instead of FastAPI's threadpool. Serverless runtimes often
+# lack the shared memory multiprocessing needs, hence threads there.
+PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread" if os.environ.get("VERCEL") else "process")
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 1))
+# Hash jobs allowed to queue or run at once before new ones are refused
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 64))
+
+logger = logging.getLogger(__name__)
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
@@ -21,6 +45,70 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hash jobs are already pending."""
+
+
+_hash_executor = None
+_hash_executor_lock = threading.Lock()
+_hash_pending = 0
+
+def _get_hash_executor():
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is None:
+            if PASSWORD_HASH_EXECUTOR == "process":
+                try:
+                    _hash_executor = ProcessPoolExecutor(
+                        max_workers=PASSWORD_HASH_WORKERS,
+                        mp_context=multiprocessing.get_context("spawn"),
+                    )
+                except (OSError, NotImplementedError) as e:
+                    logger.warning("process pool unavailable for password hashing, using threads error=%s", e)
+            if _hash_executor is None:
+                _hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+        return _hash_executor
+
+async def _run_hash_job(func, *args):
+    global _hash_pending
+    if _hash_pending >= PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHasherBusy()
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        executor = _get_hash_executor()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool and retry once
+            _replace_broken_executor(executor)
+            return await loop.run_in_executor(_get_hash_executor(), func, *args)
+    finally:
+        _hash_pending -= 1
+
+async def verify_password_async(plain_password, hashed_password):
+    return await _run_hash_job(verify_password, plain_password, hashed_password)
+
+async def get_password_hash_async(password):
+    return await _run_hash_job(get_password_hash, password)
+
+def _replace_broken_executor(executor):
+    """Drop `executor` if it is still the current pool; concurrent jobs that
+    failed on the same pool must not shut down the replacement (and cancel
+    retries another job already submitted to it)."""
+    global _hash_executor
+    with _hash_executor_lock:
+        if _hash_executor is executor:
+            _hash_executor = None
+    executor.shutdown(wait=False)
+
+def shutdown_hash_executor():
+    global _hash_executor
+    with _hash_executor_lock:
+        executor, _hash_executor = _hash_executor, None
+    if executor is not None:
+        executor.shutdown(wait=False, cancel_futures=True)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -30,3 +118,46 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as endpoints see it; needs no database session."""
+    id: int
+    email: str
+
+
+class PrincipalCache:
+    """Short-lived email -> Principal cache in front of the per-request user lookup."""
+
+    def __init__(self, ttl_seconds=PRINCIPAL_CACHE_TTL_SECONDS, max_entries=PRINCIPAL_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, email: str) -> Optional[Principal]:
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            self.invalidate(email)
+            return None
+        return entry[1]
+
+    def set(self, principal: Principal):
+        if self.ttl_seconds <= 0:
+            return
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Cheap bound: entries are short-lived, so starting over is fine
+                self._entries.clear()
+            self._entries[principal.email] = (time.monotonic() + self.ttl_seconds, principal)
+
+    def invalidate(self, email: str):
+        with self._lock:
+            self._entries.pop(email, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
@@ -0,0 +1,118 @@
+"""Password hashing benchmark.
+
+Measures bcrypt verify throughput per core, then runs the app in-process
+(fake translation provider, throwaway SQLite database) to show login
+throughput and how a login storm affects concurrent /translate/text latency.
+
+    python bench_auth.py --logins 200 --translations 200 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def report(label, latencies):
+    print(f"   {label}: n={len(latencies)} "
+          f"p50={percentile(latencies, 50) * 1000:.1f}ms "
+          f"p95={percentile(latencies, 95) * 1000:.1f}ms "
+          f"p99={percentile(latencies, 99) * 1000:.1f}ms")
+
+
+async def timed(coro):
+    start = time.perf_counter()
+    response = await coro
+    return response, time.perf_counter() - start
+
+
+async def run_app_benchmark(args):
+    import httpx
+    import main
+    from services import gemini_service
+
+    async def fake_translate(text, target_language, reference=None):
+        await asyncio.sleep(args.provider_latency / 1000)
+        return f"[{target_language}] {text}"
+    gemini_service.translate_text_async = fake_translate
+    main.ai_service = gemini_service
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+        credentials = {"username": "bench@example.com", "password": "bench-password"}
+        await client.post("/users", data=credentials)
+        token = (await client.post("/token", data=credentials)).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        def translation(i):
+            data = {"text": f"Benchmark sentence {i}", "target_language": "Hindi", "bypass_cache": "true"}
+            return timed(client.post("/translate/text", data=data, headers=headers))
+
+        print("\n2. Translation latency without logins...")
+        results = await asyncio.gather(*[translation(i) for i in range(args.translations)])
+        report("translate", [elapsed for _, elapsed in results])
+
+        print(f"\n3. Translation latency during a storm of {args.logins} logins...")
+        start = time.perf_counter()
+        logins = [timed(client.post("/token", data=credentials)) for _ in range(args.logins)]
+        translations = [translation(i) for i in range(args.translations)]
+        results = await asyncio.gather(*logins, *translations)
+        elapsed = time.perf_counter() - start
+        login_results, translation_results = results[:args.logins], results[args.logins:]
+        ok = [t for r, t in login_results if r.status_code == 200]
+        rejected = sum(1 for r, _ in login_results if r.status_code == 503)
+        report("translate", [t for _, t in translation_results])
+        report("login", ok or [0.0])
+        print(f"   logins: {len(ok)} ok, {rejected} rejected (503) in {elapsed:.2f}s "
+              f"-> {len(ok) / elapsed:.1f}/s with {os.environ['PASSWORD_HASH_WORKERS']} "
+              f"{os.environ['PASSWORD_HASH_EXECUTOR']} workers")
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--verifies", type=int, default=20, help="sequential verifies for the per-core figure")
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--translations", type=int, default=100)
+    parser.add_argument("--provider-latency", type=float, default=50, help="fake provider latency in ms")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--executor", choices=["process", "thread"], default="process")
+    args = parser.parse_args()
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    os.environ["PASSWORD_HASH_WORKERS"] = str(args.workers)
+    os.environ["PASSWORD_HASH_EXECUTOR"] = args.executor
+    os.environ.setdefault("PASSWORD_HASH_MAX_PENDING", str(max(args.logins, 64)))
+    # One benchmark user sends every request; per-user limits would only measure 429s
+    os.environ.setdefault("RATE_LIMIT_USER_PER_MINUTE", "0")
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # The app's default SQLite file lives in the working directory; keep the benchmark's out of the repo
+    os.chdir(tempfile.mkdtemp(prefix="bench_auth_"))
+
+    import auth
+
+    print(f"1. bcrypt verify throughput on one core (rounds={args.rounds})...")
+    hashed = auth.get_password_hash("bench-password")
+    start = time.perf_counter()
+    durations = []
+    for _ in range(args.verifies):
+        t = time.perf_counter()
+        auth.verify_password("bench-password", hashed)
+        durations.append(time.perf_counter() - t)
+    total = time.perf_counter() - start
+    print(f"   {args.verifies / total:.1f} verifies/s per core "
+          f"(mean {statistics.mean(durations) * 1000:.1f}ms each)")
+
+    asyncio.run(run_app_benchmark(args))
+    auth.shutdown_hash_executor()
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,157 @@
+"""Provider client setup benchmark.
+
+1. Per-request setup before a Gemini call reaches the network: building a
+   GenerativeModel and the prompt inline (old) versus the shared client
+   registry and precompiled prompt templates (new).
+2. Connection reuse against a local HTTP server: a client per request, the
+   httpx default pool (idle connections dropped after 5s) and the pool from
+   services.clients, with idle gaps between requests scaled down so the
+   benchmark runs in seconds. Against a real provider every new connection
+   also pays a TLS handshake, so the gap is far larger than shown here.
+
+No API key or network access is needed.
+
+    python bench_clients.py --iterations 20000 --requests 50
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+
+def per_call(func, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        func(i)
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_setup(args):
+    import google.generativeai as genai
+    from services import gemini_service, prompts, batching
+
+    targets = ["Hindi", "Hinglish", "Spanish", "romanized tamil"]
+    texts = [f"Benchmark sentence number {i}, long enough to look like a real request." for i in range(20)]
+
+    def old_translate(i):
+        genai.GenerativeModel(gemini_service.MODEL_NAME)
+        target = targets[i % len(targets)]
+        if target.lower() in prompts.ROMANIZED_MAP:
+            base_lang = prompts.ROMANIZED_MAP[target.lower()]
+            target = f"{base_lang} but write it using English letters (romanized {base_lang})"
+        return f"Translate the following text to {target}. Return only the translated text.\n\nText: {texts[i % 20]}"
+
+    def new_translate(i):
+        gemini_service.get_model()
+        return prompts.translation_prompt(texts[i % 20], targets[i % len(targets)])
+
+    def old_batch(i):
+        genai.GenerativeModel(gemini_service.MODEL_NAME, generation_config={"response_mime_type": "application/json"})
+        return f"{targets[i % len(targets)]} {len(texts)} {batching.batch_payload(texts)}"
+
+    def new_batch(i):
+        gemini_service.get_model(gemini_service.JSON_CONFIG)
+        return prompts.batch_prompt(texts, targets[i % len(targets)])
+
+    def old_image(i):
+        romanized_map = {
+            'hinglish': 'Hindi', 'romanized marathi': 'Marathi', 'romanized bengali': 'Bengali',
+            'romanized tamil': 'Tamil', 'romanized telugu': 'Telugu', 'romanized gujarati': 'Gujarati',
+            'romanized kannada': 'Kannada', 'romanized malayalam': 'Malayalam', 'romanized punjabi': 'Punjabi',
+            'romanized urdu': 'Urdu', 'romanized odia': 'Odia', 'romanized assamese': 'Assamese',
+            'romanized japanese': 'Japanese'
+        }
+        genai.GenerativeModel(gemini_service.MODEL_NAME)
+        target = targets[i % len(targets)]
+        if target.lower() in romanized_map:
+            base_lang = romanized_map[target.lower()]
+            return (f"Extract all text from this image. If there is text, translate it to {base_lang} but write it "
+                    f"using English letters (romanized {base_lang}). If there is no text, describe the image in "
+                    f"romanized {base_lang} (using English letters).")
+        return (f"Extract all text from this image and translate it to {target}. "
+                f"If there is no text, describe the image in {target}.")
+
+    def new_image(i):
+        gemini_service.get_model()
+        return prompts.image_prompt(targets[i % len(targets)])
+
+    print(f"1. Per-request setup over {args.iterations} iterations:")
+    for label, old, new in (("translate", old_translate, new_translate),
+                            ("batch", old_batch, new_batch),
+                            ("image", old_image, new_image)):
+        new(0)  # first call builds the shared model
+        before, after = per_call(old, args.iterations), per_call(new, args.iterations)
+        print(f"   {label:<9} before={before * 1e6:7.2f}us  after={after * 1e6:7.2f}us")
+    print(f"   registry: {gemini_service.clients.registry.snapshot()}")
+
+
+async def bench_connections(args):
+    import httpx
+    from services import clients
+
+    opened = 0
+
+    async def handle(reader, writer):
+        nonlocal opened
+        opened += 1
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                await asyncio.sleep(args.server_latency / 1000)
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/"
+    # Idle gaps between bursts, and the default 5s expiry, shrunk by the same factor
+    scale = args.gap / 1000 / 10
+    default_limits = httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=5 * scale)
+    shared_limits = clients.http_limits()
+
+    async def run(label, make_client, per_request):
+        nonlocal opened
+        opened = 0
+        latencies = []
+        client = None if per_request else make_client()
+        for i in range(args.requests):
+            if i and i % 5 == 0:
+                await asyncio.sleep(args.gap / 1000)
+            start = time.perf_counter()
+            if per_request:
+                async with make_client() as c:
+                    await c.get(url)
+            else:
+                await client.get(url)
+            latencies.append(time.perf_counter() - start)
+        if client is not None:
+            await client.aclose()
+        mean = sum(latencies) / len(latencies)
+        print(f"   {label:<22} connections={opened:<4} mean={mean * 1000:6.2f}ms")
+
+    print(f"\n2. {args.requests} requests in bursts of 5 with {args.gap:.0f}ms idle gaps:")
+    await run("client per request", lambda: httpx.AsyncClient(limits=default_limits), True)
+    await run("httpx default pool", lambda: httpx.AsyncClient(limits=default_limits), False)
+    await run("services.clients pool", lambda: httpx.AsyncClient(limits=shared_limits), False)
+    server.close()
+    await server.wait_closed()
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--gap", type=float, default=100, help="idle gap between bursts in ms")
+    parser.add_argument("--server-latency", type=float, default=1, help="local server latency in ms")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    bench_setup(args)
+    asyncio.run(bench_connections(args))
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,362 @@
+"""Offline load test.
+
+Runs the app in-process (httpx ASGITransport, throwaway SQLite database and
+TTS cache) against a fake provider with configurable latency, error rate and
+streaming, and drives a weighted mix of /token, /translate/text,
+/translate/text/stream, /translate/voice, /translate/image, /tts and
+/history traffic at a fixed concurrency. Reports throughput, latency
+percentiles per endpoint and a per-stage breakdown taken from each
+response's Server-Timing header.
+
+Save a run as the baseline, then compare later runs against it; the
+comparison exits non-zero when an endpoint's p95 or throughput regresses
+by more than --tolerance.
+
+    python bench_load.py --requests 2000 --concurrency 50 --save-baseline baseline.json
+    python bench_load.py --requests 2000 --concurrency 50 --baseline baseline.json
+
+No API key or network access is needed.
+"""
+import argparse
+import asyncio
+import io
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+DEFAULT_MIX = "text=40,stream=5,voice=10,image=5,tts=15,history=20,token=5"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def parse_mix(spec):
+    mix = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, weight = item.partition("=")
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def parse_server_timing(header):
+    """{stage: milliseconds} from a Server-Timing header."""
+    stages = {}
+    for entry in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, *params = entry.split(";")
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip() == "dur":
+                stages[name.strip()] = float(value)
+    return stages
+
+
+class FakeProvider:
+    """Stands in for a provider service module: the same async interface, simulated latency and failures.
+
+    Latency is log-normal around `latency_ms` (sigma 0 makes it constant).
+    Calls fail with probability `error_rate`: non-streaming calls return
+    None like the real services, streams raise before their first chunk.
+    """
+
+    PROVIDER = "fake"
+    MODEL_NAME = "fake-model"
+    TTS_VOICE = "fake-voice"
+
+    def __init__(self, latency_ms, sigma, error_rate, stream_chunks, seed):
+        from services.concurrency import Limiter
+        from services import prompts
+
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self.stream_chunks = stream_chunks
+        self.random = random.Random(seed)
+        self.provider_slots = Limiter(int(os.getenv("GEMINI_MAX_CONCURRENCY", 128)))
+        self.resolve_target_language = prompts.resolve_target_language
+        self.tts_language_code = prompts.tts_language_code
+
+    def _latency(self, scale=1.0):
+        return self.latency_ms * scale * math.exp(self.sigma * self.random.gauss(0, 1)) / 1000
+
+    def _fails(self):
+        return self.random.random() < self.error_rate
+
+    async def _call(self, result, scale=1.0):
+        async with self.provider_slots:
+            await asyncio.sleep(self._latency(scale))
+        return None if self._fails() else result
+
+    async def warm_up(self):
+        pass
+
+    async def translate_text_async(self, text, target_language, reference=None):
+        return await self._call(f"[{target_language}] {text}")
+
+    async def translate_batch_async(self, texts, target_language):
+        return await self._call([f"[{target_language}] {text}" for text in texts], scale=2.0)
+
+    async def translate_text_stream(self, text, target_language):
+        if self._fails():
+            raise RuntimeError("simulated provider error")
+        words = f"[{target_language}] {text}".split()
+        per_chunk = max(1, math.ceil(len(words) / self.stream_chunks))
+        async with self.provider_slots:
+            for start in range(0, len(words), per_chunk):
+                await asyncio.sleep(self._latency(1 / self.stream_chunks))
+                yield " ".join(words[start:start + per_chunk]) + " "
+
+    async def transcribe_audio_async(self, audio_file_path):
+        return await self._call("spoken words from the benchmark", scale=2.0)
+
+    async def transcribe_and_translate_async(self, audio_file_path, target_language):
+        transcript = "spoken words from the benchmark"
+        return await self._call({"transcript": transcript, "translation": f"[{target_language}] {transcript}"}, scale=2.5)
+
+    async def generate_text_async(self, contents):
+        result = await self._call("Text found in the image, translated.", scale=1.5)
+        if result is None:
+            raise RuntimeError("simulated provider error")
+        return result
+
+    async def text_to_speech_async(self, text, language="en"):
+        return await self._call(b"ID3" + text.encode() * 64)
+
+    async def text_to_speech_stream(self, text, language="en"):
+        async for fragment in self.translate_text_stream(text, language):
+            yield b"ID3" + fragment.encode()
+
+
+def sample_image(size):
+    import PIL.Image
+    image = PIL.Image.effect_noise((size, size * 3 // 4), 64).convert("RGB")
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=90)
+    return out.getvalue()
+
+
+def sample_audio(seconds, sample_rate=16000):
+    import voice_stream
+    tone = random.Random(0).randbytes(sample_rate * 2 * seconds)
+    return voice_stream.to_wav(tone, sample_rate)
+
+
+class Workload:
+    """Builds one request of each kind; texts repeat with probability `repeat_ratio` to exercise the caches."""
+
+    def __init__(self, client, tokens, credentials, args):
+        self.client = client
+        self.tokens = tokens
+        self.credentials = credentials
+        self.repeat_ratio = args.repeat_ratio
+        self.random = random.Random(args.seed)
+        self.image = sample_image(args.image_size)
+        self.audio = sample_audio(args.audio_seconds)
+        self.counter = 0
+
+    def _headers(self):
+        return {"Authorization": f"Bearer {self.random.choice(self.tokens)}"}
+
+    def _text(self):
+        self.counter += 1
+        if self.random.random() < self.repeat_ratio:
+            return f"Frequently translated sentence number {self.random.randrange(20)}."
+        return f"A fresh sentence for the load test, number {self.counter}, with a few more words."
+
+    def _target(self):
+        return self.random.choice(["Hindi", "Spanish", "Hinglish", "French"])
+
+    def request(self, kind):
+        client = self.client
+        if kind == "token":
+            return client.post("/token", data=self.random.choice(self.credentials))
+        if kind == "text":
+            return client.post("/translate/text", data={"text": self._text(), "target_language": self._target()},
+                               headers=self._headers())
+        if kind == "stream":
+            return client.post("/translate/text/stream", data={"text": self._text(), "target_language": self._target()},
+                               headers=self._headers())
+        if kind == "voice":
+            return client.post("/translate/voice", files={"file": ("speech.wav", self.audio, "audio/wav")},
+                               data={"target_language": self._target()}, headers=self._headers())
+        if kind == "image":
+            return client.post("/translate/image", files={"file": ("photo.jpg", self.image, "image/jpeg")},
+                               data={"target_language": self._target()}, headers=self._headers())
+        if kind == "tts":
+            return client.post("/tts", data={"text": self._text(), "language": self._target()}, headers=self._headers())
+        if kind == "history":
+            return client.get("/history", params={"limit": 50}, headers=self._headers())
+        raise ValueError(f"Unknown request kind: {kind}")
+
+
+async def run_load(args):
+    import httpx
+    import main
+    from services import gemini_service, router
+
+    fake = FakeProvider(args.latency_ms, args.latency_sigma, args.error_rate, args.stream_chunks, args.seed)
+    main.providers = [fake]
+    main.ai_service = router.ProviderRouter([fake], preferred=fake, admission=main.provider_budget.admit)
+    # Image analysis calls Gemini directly
+    gemini_service.generate_text_async = fake.generate_text_async
+
+    mix = parse_mix(args.mix)
+    kinds, weights = list(mix), list(mix.values())
+    picker = random.Random(args.seed)
+    results = defaultdict(list)  # kind -> [(status, seconds, {stage: ms})]
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with main.lifespan(main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            credentials = [{"username": f"load{i}@example.com", "password": "bench-password"} for i in range(args.users)]
+            tokens = []
+            for form in credentials:
+                await client.post("/users", data=form)
+                tokens.append((await client.post("/token", data=form)).json()["access_token"])
+            workload = Workload(client, tokens, credentials, args)
+
+            async def drive(count, record):
+                remaining = count
+                async def worker():
+                    nonlocal remaining
+                    while remaining > 0:
+                        remaining -= 1
+                        kind = picker.choices(kinds, weights)[0]
+                        start = time.perf_counter()
+                        response = await workload.request(kind)
+                        elapsed = time.perf_counter() - start
+                        if record:
+                            results[kind].append((response.status_code, elapsed,
+                                                  parse_server_timing(response.headers.get("server-timing"))))
+                await asyncio.gather(*[worker() for _ in range(args.concurrency)])
+
+            await drive(args.warmup, record=False)
+            start = time.perf_counter()
+            await drive(args.requests, record=True)
+            wall = time.perf_counter() - start
+    return results, wall
+
+
+def summarize(results, wall):
+    endpoints = {}
+    for kind, samples in sorted(results.items()):
+        latencies = [elapsed for _, elapsed, _ in samples]
+        errors = sum(1 for status, _, _ in samples if status >= 400)
+        stages = defaultdict(list)
+        for _, _, timings in samples:
+            for stage, ms in timings.items():
+                stages[stage].append(ms)
+        endpoints[kind] = {
+            "requests": len(samples),
+            "rps": round(len(samples) / wall, 2),
+            "error_rate": round(errors / len(samples), 4),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "stages": {
+                stage: {"mean_ms": round(sum(values) / len(values), 2), "p95_ms": round(percentile(values, 95), 2)}
+                for stage, values in stages.items() if stage != "total"
+            },
+        }
+    everything = [elapsed for samples in results.values() for _, elapsed, _ in samples]
+    return {
+        "requests": len(everything),
+        "wall_seconds": round(wall, 2),
+        "rps": round(len(everything) / wall, 2),
+        "p50_ms": round(percentile(everything, 50) * 1000, 1),
+        "p95_ms": round(percentile(everything, 95) * 1000, 1),
+        "p99_ms": round(percentile(everything, 99) * 1000, 1),
+        "endpoints": endpoints,
+    }
+
+
+def print_summary(summary):
+    print(f"\n{summary['requests']} requests in {summary['wall_seconds']}s -> {summary['rps']} req/s "
+          f"(p50 {summary['p50_ms']}ms, p95 {summary['p95_ms']}ms, p99 {summary['p99_ms']}ms)\n")
+    print(f"   {'endpoint':<10} {'n':>6} {'req/s':>8} {'err%':>6} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for kind, row in summary["endpoints"].items():
+        print(f"   {kind:<10} {row['requests']:>6} {row['rps']:>8} {row['error_rate'] * 100:>6.1f} "
+              f"{row['p50_ms']:>7}ms {row['p95_ms']:>7}ms {row['p99_ms']:>7}ms")
+    print("\n   Stages (Server-Timing, mean / p95 ms):")
+    for kind, row in summary["endpoints"].items():
+        parts = [f"{stage} {s['mean_ms']}/{s['p95_ms']}" for stage, s in row["stages"].items()]
+        print(f"   {kind:<10} {', '.join(parts) or '-'}")
+
+
+def compare(summary, baseline, tolerance):
+    """Print changes against the baseline; returns the regressed endpoints."""
+    print(f"\n   Against baseline (tolerance {tolerance:.0%}):")
+    regressions = []
+    for kind, row in summary["endpoints"].items():
+        old = baseline["endpoints"].get(kind)
+        if not old:
+            continue
+        p95_change = (row["p95_ms"] - old["p95_ms"]) / old["p95_ms"] if old["p95_ms"] else 0.0
+        rps_change = (row["rps"] - old["rps"]) / old["rps"] if old["rps"] else 0.0
+        regressed = p95_change > tolerance or rps_change < -tolerance
+        if regressed:
+            regressions.append(kind)
+        print(f"   {kind:<10} p95 {old['p95_ms']}ms -> {row['p95_ms']}ms ({p95_change:+.0%}), "
+              f"req/s {old['rps']} -> {row['rps']} ({rps_change:+.0%}){'  REGRESSION' if regressed else ''}")
+    return regressions
+
+
+def main_benchmark():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests")
+    parser.add_argument("--warmup", type=int, default=50, help="requests sent before measuring")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="request kinds and weights")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--repeat-ratio", type=float, default=0.3, help="share of texts drawn from a small repeated set")
+    parser.add_argument("--latency-ms", type=float, default=200, help="median fake provider latency")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal spread; 0 for constant latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of provider calls that fail")
+    parser.add_argument("--stream-chunks", type=int, default=8, help="chunks per streamed reply")
+    parser.add_argument("--image-size", type=int, default=1600, help="width of the test image in pixels")
+    parser.add_argument("--audio-seconds", type=int, default=3)
+    parser.add_argument("--rounds", type=int, default=4, help="bcrypt cost factor (the app default is 12)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--save-baseline", metavar="PATH", help="write this run's results as a baseline")
+    parser.add_argument("--baseline", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 / throughput change")
+    args = parser.parse_args()
+    save_path = os.path.abspath(args.save_baseline) if args.save_baseline else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    os.environ["BCRYPT_ROUNDS"] = str(args.rounds)
+    # A handful of benchmark users send every request; per-user limits would only measure 429s
+    os.environ.setdefault("RATE_LIMIT_USER_PER_MINUTE", "0")
+    os.environ.setdefault("AI_PROVIDER_FAILOVER", "false")
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    os.environ.setdefault("TTS_CACHE_DIR", os.path.join(workdir, "tts"))
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    # The app's default SQLite file lives in the working directory; keep the benchmark's out of the repo
+    os.chdir(workdir)
+
+    print(f"Load test: {args.requests} requests at concurrency {args.concurrency}, mix {args.mix}, "
+          f"provider {args.latency_ms}ms (sigma {args.latency_sigma}), error rate {args.error_rate}")
+    results, wall = asyncio.run(run_load(args))
+    summary = summarize(results, wall)
+    print_summary(summary)
+
+    regressions = []
+    if baseline_path:
+        with open(baseline_path) as f:
+            regressions = compare(summary, json.load(f), args.tolerance)
+    if save_path:
+        with open(save_path, "w") as f:
+            json.dump({"config": vars(args), **summary}, f, indent=2)
+        print(f"\n   Baseline saved to {save_path}")
+    if regressions:
+        sys.exit(f"\nRegressed: {', '.join(regressions)}")
+
+
+if __name__ == "__main__":
+    main_benchmark()
@@ -0,0 +1,194 @@
+import difflib
+import os
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+
+import models
+from services.prompts import resolve_target_language
+
+FUZZY_MEMORY_ENTRIES = int(os.getenv("FUZZY_MEMORY_ENTRIES", 20000))
+# Similarity (0-1) at or above which a prior translation is returned without a provider call.
+# 1.0 serves inputs differing only in case, punctuation and spacing: one swapped word
+# ("door"/"window") in a sentence still scores over 0.9.
+FUZZY_MEMORY_SERVE_THRESHOLD = float(os.getenv("FUZZY_MEMORY_SERVE_THRESHOLD", 1.0))
+# Similarity at or above which the closest prior translation is given to the model as a reference
+FUZZY_MEMORY_REFERENCE_THRESHOLD = float(os.getenv("FUZZY_MEMORY_REFERENCE_THRESHOLD", 0.6))
+# Longer inputs are rarely near-repeats and would dominate memory use
+FUZZY_MEMORY_MAX_CHARS = int(os.getenv("FUZZY_MEMORY_MAX_CHARS", 500))
+INDEXED_INPUT_TYPES = {"text"}
+
+NGRAM = 3
+# LSH: BANDS x ROWS MinHash values; texts sharing any band are candidates.
+# 16 bands of 4 find pairs with n-gram Jaccard ~0.5 or more with high probability.
+BANDS = 16
+ROWS = 4
+SLOTS = BANDS * ROWS
+MAX_CANDIDATES = 8
+_EMPTY = 1 << 64
+_digits = re.compile(r"\d+")
+
+Match = namedtuple("Match", "score source translation servable")
+
+
+def match_text(text: str) -> str:
+    """Casefolded text with punctuation and symbols dropped and whitespace collapsed."""
+    text = unicodedata.normalize("NFKC", text).casefold()
+    stripped = "".join(" " if unicodedata.category(c)[0] in "PSZC" else c for c in text)
+    return " ".join(stripped.split())
+
+
+def signature(text: str):
+    """One-permutation MinHash of the character n-grams of an already normalized text.
+
+    Each n-gram is hashed once and kept as the minimum of one of SLOTS bins;
+    bins no n-gram landed in borrow from the next filled bin (rotation
+    densification), so short texts still get a full signature.
+    """
+    padded = f" {text} "
+    grams = {padded[i:i + NGRAM] for i in range(max(1, len(padded) - NGRAM + 1))}
+    bins = [_EMPTY] * SLOTS
+    for gram in grams:
+        # str hashes are salted per process, which is fine for an in-process index
+        h = hash(gram) & 0xFFFFFFFFFFFFFFFF
+        slot, value = h % SLOTS, h // SLOTS
+        if value < bins[slot]:
+            bins[slot] = value
+    for slot in range(SLOTS):
+        if bins[slot] == _EMPTY:
+            for distance in range(1, SLOTS):
+                borrowed = bins[(slot + distance) % SLOTS]
+                if borrowed != _EMPTY:
+                    bins[slot] = borrowed + distance
+                    break
+    return bins
+
+
+def _bands(scope, bins):
+    return [(scope, band, tuple(bins[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+class FuzzyMemory:
+    """In-process index of prior translations for near-duplicate lookups, per user and target language.
+
+    Entries and LSH buckets are keyed by (user_id, target language), so a
+    lookup only ever sees the requesting user's own history.
+
+    Candidates come from MinHash LSH buckets and are re-scored with
+    difflib's ratio on the normalized texts, which is what `score` reports.
+    A match is only servable when it also has the same numbers as the
+    input, since "3 apples" and "4 apples" are otherwise near-identical.
+    """
+
+    def __init__(self, max_entries=FUZZY_MEMORY_ENTRIES, serve_threshold=FUZZY_MEMORY_SERVE_THRESHOLD,
+                 reference_threshold=FUZZY_MEMORY_REFERENCE_THRESHOLD, max_chars=FUZZY_MEMORY_MAX_CHARS):
+        self.max_entries = max_entries
+        self.serve_threshold = serve_threshold
+        self.reference_threshold = reference_threshold
+        self.max_chars = max_chars
+        self._entries = OrderedDict()  # ((user_id, target), normalized) -> (source, translation, bands)
+        self._buckets = {}  # ((user_id, target), band, values) -> set of entry keys
+        self._lock = threading.Lock()
+        self.stats = {"lookups": 0, "served": 0, "referenced": 0, "misses": 0, "indexed": 0}
+
+    def add(self, user_id, source: str, translation: str, target_language: str):
+        if user_id is None or not source or not translation or not target_language or len(source) > self.max_chars:
+            return
+        normalized = match_text(source)
+        if not normalized:
+            return
+        scope = (user_id, resolve_target_language(target_language))
+        key = (scope, normalized)
+        bands = _bands(scope, signature(normalized))
+        with self._lock:
+            # A repeat replaces the older translation and moves to the young end
+            self._discard(key)
+            self._entries[key] = (source, translation, bands)
+            for band in bands:
+                self._buckets.setdefault(band, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+        self.stats["indexed"] += 1
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for band in entry[2]:
+            bucket = self._buckets.get(band)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band]
+
+    def lookup(self, user_id, text: str, target_language: str):
+        """Closest prior translation of this user's at or above the reference threshold, or None."""
+        self.stats["lookups"] += 1
+        normalized = match_text(text) if len(text) <= self.max_chars else ""
+        if not normalized:
+            self.stats["misses"] += 1
+            return None
+        scope = (user_id, resolve_target_language(target_language))
+        bands = _bands(scope, signature(normalized))
+        with self._lock:
+            votes = {}
+            for band in bands:
+                for key in self._buckets.get(band, ()):
+                    votes[key] = votes.get(key, 0) + 1
+            # Most shared bands first: the best estimates of n-gram similarity
+            candidates = sorted(votes, key=votes.get, reverse=True)[:MAX_CANDIDATES]
+            entries = [(key[1], self._entries[key]) for key in candidates]
+
+        best = None
+        matcher = difflib.SequenceMatcher(None, autojunk=False)
+        matcher.set_seq2(normalized)
+        for candidate, (source, translation, _) in entries:
+            floor = best[0] if best else self.reference_threshold
+            matcher.set_seq1(candidate)
+            # Cheap upper bounds first; ratio() is quadratic in the worst case
+            if matcher.real_quick_ratio() < floor or matcher.quick_ratio() < floor:
+                continue
+            score = matcher.ratio()
+            if score >= floor:
+                best = (score, candidate, source, translation)
+                if score == 1.0:
+                    break
+        if best is None:
+            self.stats["misses"] += 1
+            return None
+
+        score, candidate, source, translation = best
+        servable = score >= self.serve_threshold and _digits.findall(normalized) == _digits.findall(candidate)
+        self.stats["served" if servable else "referenced"] += 1
+        return Match(round(score, 4), source, translation, servable)
+
+    def on_history_written(self, rows):
+        """HistoryWriter listener: index translated text as it is recorded."""
+        for row in rows:
+            if row.get("input_type") in INDEXED_INPUT_TYPES:
+                self.add(
+                    row.get("user_id"), row.get("original_content"), row.get("translated_content"),
+                    row.get("target_language"),
+                )
+
+    def load(self, session_factory):
+        """Index the newest history rows, oldest first so recency order matches later adds."""
+        History = models.TranslationHistory
+        db = session_factory()
+        try:
+            rows = (
+                db.query(History.user_id, History.original_content, History.translated_content, History.target_language)
+                .filter(History.input_type.in_(INDEXED_INPUT_TYPES))
+                .order_by(History.id.desc())
+                .limit(self.max_entries)
+                .all()
+            )
+        finally:
+            db.close()
+        for user_id, source, translation, target_language in reversed(rows):
+            self.add(user_id, source, translation, target_language)
+        return len(rows)
+
+    def snapshot(self):
+        return {**self.stats, "entries": len(self._entries), "buckets": len(self._buckets)}
@@ -0,0 +1,267 @@
+import logging
+import os
+import re
+import unicodedata
+
+from sqlalchemy import DateTime, text
+
+# "auto" picks FTS5 on SQLite and tsvector on Postgres; "like" forces the unindexed fallback
+HISTORY_SEARCH_BACKEND = os.getenv("HISTORY_SEARCH_BACKEND", "auto").lower()
+SNIPPET_TOKENS = int(os.getenv("HISTORY_SEARCH_SNIPPET_TOKENS", 16))
+# Only a user's newest N matches are scored, keeping common words as fast as rare ones
+RANK_WINDOW = int(os.getenv("HISTORY_SEARCH_RANK_WINDOW", 2000))
+HIGHLIGHT = "**"
+
+# FTS5's unicode61 tokenizer predates most Indic and Arabic combining marks and
+# treats vowel signs and viramas as separators, shredding words like "नमस्ते".
+# Declaring them token characters keeps those words whole.
+TOKEN_MARKS = "".join(chr(c) for c in range(0x0600, 0x0E00) if unicodedata.category(chr(c)) in ("Mn", "Mc"))
+_TERM = re.compile(r'"([^"]*)"|(\S+)')
+_WORD = re.compile(rf"(?:[^\W_]|[\u0300-\u036f{TOKEN_MARKS}])+")
+
+logger = logging.getLogger(__name__)
+
+
+def parse_query(query, prefix=False):
+    """Split a user query into terms: (words, is_prefix). Quoted text is one phrase.
+
+    Only word characters survive, so the terms can be quoted into any
+    backend's query syntax without escaping. A trailing `*` (or prefix=True
+    for every term) makes the last word of a term a prefix match.
+    """
+    terms = []
+    for phrase, word in _TERM.findall(query):
+        words = _WORD.findall(unicodedata.normalize("NFC", phrase or word))
+        if words:
+            terms.append((words, prefix or (not phrase and word.endswith("*"))))
+    return terms
+
+
+def _row(row, score):
+    return {
+        "id": row.id,
+        "timestamp": row.timestamp,
+        "input_type": row.input_type,
+        "source_language": row.source_language,
+        "target_language": row.target_language,
+        "original_snippet": row.original_snippet,
+        "translated_snippet": row.translated_snippet,
+        "score": round(score, 4),
+    }
+
+
+def _filters(input_type, target_language, params):
+    clauses = []
+    if input_type:
+        clauses.append("AND h.input_type = :input_type")
+        params["input_type"] = input_type
+    if target_language:
+        clauses.append("AND h.target_language = :target_language")
+        params["target_language"] = target_language
+    return " ".join(clauses)
+
+
+class Fts5Search:
+    """SQLite FTS5 external-content index over history, kept in sync by triggers.
+
+    user_id is indexed as a column so a user's query intersects posting
+    lists inside the index; joining on the content table to filter users
+    was several times slower for common words.
+    """
+
+    name = "fts5"
+    TABLE = "translation_history_fts"
+
+    def install(self, connection):
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": self.TABLE}
+        ).first()
+        if exists:
+            return
+        connection.execute(text(f"""
+            CREATE VIRTUAL TABLE {self.TABLE} USING fts5(
+                user_id, original_content, translated_content,
+                content='translation_history', content_rowid='id',
+                tokenize="unicode61 remove_diacritics 2 tokenchars '{TOKEN_MARKS}'",
+                prefix='2 3'
+            )
+        """))
+        columns = "user_id, original_content, translated_content"
+        new_values = "new.id, new.user_id, new.original_content, new.translated_content"
+        old_values = "'delete', old.id, old.user_id, old.original_content, old.translated_content"
+        connection.execute(text(f"""
+            CREATE TRIGGER {self.TABLE}_insert AFTER INSERT ON translation_history BEGIN
+                INSERT INTO {self.TABLE}(rowid, {columns}) VALUES ({new_values});
+            END
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER {self.TABLE}_delete AFTER DELETE ON translation_history BEGIN
+                INSERT INTO {self.TABLE}({self.TABLE}, rowid, {columns}) VALUES ({old_values});
+            END
+        """))
+        connection.execute(text(f"""
+            CREATE TRIGGER {self.TABLE}_update AFTER UPDATE ON translation_history BEGIN
+                INSERT INTO {self.TABLE}({self.TABLE}, rowid, {columns}) VALUES ({old_values});
+                INSERT INTO {self.TABLE}(rowid, {columns}) VALUES ({new_values});
+            END
+        """))
+        # Index rows written before search existed
+        connection.execute(text(f"INSERT INTO {self.TABLE}({self.TABLE}) VALUES ('rebuild')"))
+
+    def search(self, db, user_id, terms, limit, offset, input_type=None, target_language=None):
+        expression = " AND ".join(
+            '"' + " ".join(words) + '"' + ("*" if is_prefix else "") for words, is_prefix in terms
+        )
+        params = {
+            # Terms are limited to the content columns, or a number would also match user_id
+            "match": f'user_id : "{int(user_id)}" AND {{original_content translated_content}} : ({expression})',
+            "mark": HIGHLIGHT, "tokens": SNIPPET_TOKENS, "limit": limit, "offset": offset,
+            "window": RANK_WINDOW - 1,
+        }
+        filters = _filters(input_type, target_language, params)
+        join = "JOIN translation_history h ON h.id = f.rowid" if filters else ""
+        # Walking matches newest-first is cheap; scoring them is not, so a common
+        # word only ranks the user's newest RANK_WINDOW matches
+        floor = db.execute(text(f"""
+            SELECT f.rowid FROM {self.TABLE} f {join}
+            WHERE {self.TABLE} MATCH :match {filters}
+            ORDER BY f.rowid DESC LIMIT 1 OFFSET :window
+        """), params).scalar()
+        params["floor"] = floor or 0
+        # Snippets only for the page: computed in the ranking query they would run for every match
+        rows = db.execute(text(f"""
+            WITH page AS (
+                SELECT f.rowid, bm25({self.TABLE}, 0.0, 1.0, 1.0) AS rank
+                FROM {self.TABLE} f {join}
+                WHERE {self.TABLE} MATCH :match AND f.rowid >= :floor {filters}
+                ORDER BY rank, f.rowid DESC
+                LIMIT :limit OFFSET :offset
+            )
+            SELECT h.id, h.timestamp, h.input_type, h.source_language, h.target_language,
+                   snippet({self.TABLE}, 1, :mark, :mark, '…', :tokens) AS original_snippet,
+                   snippet({self.TABLE}, 2, :mark, :mark, '…', :tokens) AS translated_snippet,
+                   page.rank
+            FROM page CROSS JOIN {self.TABLE} CROSS JOIN translation_history h
+            WHERE {self.TABLE} MATCH :match AND {self.TABLE}.rowid = page.rowid AND h.id = page.rowid
+            ORDER BY page.rank, page.rowid DESC
+        """).columns(timestamp=DateTime), params).all()
+        # bm25 is lower-is-better; flip it so higher scores rank first
+        return [_row(row, -row.rank) for row in rows]
+
+
+class PostgresSearch:
+    """Generated tsvector column with a GIN index ('simple' config: no stemming, any language)."""
+
+    name = "tsvector"
+
+    def install(self, connection):
+        connection.execute(text("""
+            ALTER TABLE translation_history ADD COLUMN IF NOT EXISTS search_vector tsvector
+            GENERATED ALWAYS AS (
+                to_tsvector('simple', coalesce(original_content, '') || ' ' || coalesce(translated_content, ''))
+            ) STORED
+        """))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_translation_history_search ON translation_history USING GIN (search_vector)"
+        ))
+
+    def search(self, db, user_id, terms, limit, offset, input_type=None, target_language=None):
+        def term(words, is_prefix):
+            quoted = [f"'{word.lower()}'" for word in words]
+            if is_prefix:
+                quoted[-1] += ":*"
+            return "(" + " <-> ".join(quoted) + ")"
+
+        params = {
+            "query": " & ".join(term(words, is_prefix) for words, is_prefix in terms),
+            "user_id": user_id, "limit": limit, "offset": offset, "window": RANK_WINDOW,
+            "options": f"StartSel={HIGHLIGHT}, StopSel={HIGHLIGHT}, MaxWords={SNIPPET_TOKENS}, MinWords=5",
+        }
+        filters = _filters(input_type, target_language, params)
+        # Same bound as FTS5: rank the newest RANK_WINDOW matches, headline only the page
+        rows = db.execute(text(f"""
+            WITH recent AS (
+                SELECT h.id, h.timestamp, h.input_type, h.source_language, h.target_language,
+                       h.original_content, h.translated_content, h.search_vector
+                FROM translation_history h
+                WHERE h.user_id = :user_id AND h.search_vector @@ to_tsquery('simple', :query) {filters}
+                ORDER BY h.id DESC
+                LIMIT :window
+            ), page AS (
+                SELECT recent.*, ts_rank_cd(recent.search_vector, to_tsquery('simple', :query)) AS rank
+                FROM recent
+                ORDER BY rank DESC, recent.id DESC
+                LIMIT :limit OFFSET :offset
+            )
+            SELECT page.id, page.timestamp, page.input_type, page.source_language, page.target_language, page.rank,
+                   ts_headline('simple', coalesce(page.original_content, ''), q, :options) AS original_snippet,
+                   ts_headline('simple', coalesce(page.translated_content, ''), q, :options) AS translated_snippet
+            FROM page, to_tsquery('simple', :query) q
+            ORDER BY page.rank DESC, page.id DESC
+        """).columns(timestamp=DateTime), params).all()
+        return [_row(row, row.rank) for row in rows]
+
+
+class LikeSearch:
+    """Unindexed fallback: substring match, newest first, snippets cut in Python."""
+
+    name = "like"
+
+    def install(self, connection):
+        pass
+
+    def _snippet(self, content, needles):
+        content = content or ""
+        lowered = content.lower()
+        hits = [(lowered.find(needle), needle) for needle in needles if needle in lowered]
+        if not hits:
+            return content[:SNIPPET_TOKENS * 6]
+        start, needle = min(hits)
+        begin = max(0, start - SNIPPET_TOKENS * 3)
+        end = start + len(needle)
+        return ("…" if begin else "") + content[begin:start] + HIGHLIGHT + content[start:end] + HIGHLIGHT + \
+            content[end:end + SNIPPET_TOKENS * 3] + ("…" if end + SNIPPET_TOKENS * 3 < len(content) else "")
+
+    def search(self, db, user_id, terms, limit, offset, input_type=None, target_language=None):
+        params = {"user_id": user_id, "limit": limit, "offset": offset}
+        conditions = []
+        for i, (words, _) in enumerate(terms):
+            params[f"term{i}"] = "%" + " ".join(words).lower() + "%"
+            conditions.append(f"(lower(h.original_content) LIKE :term{i} OR lower(h.translated_content) LIKE :term{i})")
+        rows = db.execute(text(f"""
+            SELECT h.id, h.timestamp, h.input_type, h.source_language, h.target_language,
+                   h.original_content AS original_snippet, h.translated_content AS translated_snippet
+            FROM translation_history h
+            WHERE h.user_id = :user_id AND {' AND '.join(conditions)} {_filters(input_type, target_language, params)}
+            ORDER BY h.timestamp DESC, h.id DESC
+            LIMIT :limit OFFSET :offset
+        """).columns(timestamp=DateTime), params).all()
+        needles = [" ".join(words).lower() for words, _ in terms]
+        return [
+            {**_row(row, 0.0), "original_snippet": self._snippet(row.original_snippet, needles),
+             "translated_snippet": self._snippet(row.translated_snippet, needles)}
+            for row in rows
+        ]
+
+
+def make_search(engine):
+    """Search backend for this database; pass it to install() once the tables exist."""
+    dialect = engine.dialect.name
+    if HISTORY_SEARCH_BACKEND == "like":
+        return LikeSearch()
+    if dialect == "sqlite":
+        return Fts5Search()
+    if dialect == "postgresql":
+        return PostgresSearch()
+    return LikeSearch()
+
+
+def install(search, engine):
+    """Create the index for `search`; returns the backend to use (LIKE when the index can't be built)."""
+    try:
+        with engine.begin() as connection:
+            search.install(connection)
+        return search
+    except Exception as e:
+        logger.warning("history search index unavailable (%s), falling back to LIKE: %s", search.name, e)
+        return LikeSearch()
@@ -0,0 +1,145 @@
+import asyncio
+import datetime
+import logging
+import os
+
+from sqlalchemy import insert
+from starlette.concurrency import run_in_threadpool
+
+import models
+from services import metrics
+
+HISTORY_QUEUE_SIZE = int(os.getenv("HISTORY_QUEUE_SIZE", 10000))
+HISTORY_BATCH_SIZE = int(os.getenv("HISTORY_BATCH_SIZE", 500))
+HISTORY_FLUSH_INTERVAL_MS = int(os.getenv("HISTORY_FLUSH_INTERVAL_MS", 200))
+# What submit() does when the queue is full: "block" (wait up to
+# HISTORY_BLOCK_TIMEOUT_MS, then write inline), "sync" (write inline) or "drop"
+HISTORY_OVERFLOW_POLICY = os.getenv("HISTORY_OVERFLOW_POLICY", "block").lower()
+HISTORY_BLOCK_TIMEOUT_MS = int(os.getenv("HISTORY_BLOCK_TIMEOUT_MS", 1000))
+
+_STOP = object()
+
+logger = logging.getLogger(__name__)
+
+
+class HistoryWriter:
+    """Write-behind sink for TranslationHistory rows.
+
+    Endpoints enqueue plain column dicts; a background task flushes them as
+    one bulk INSERT per batch, whichever of HISTORY_BATCH_SIZE rows or
+    HISTORY_FLUSH_INTERVAL_MS comes first. Until start() has run (or after
+    stop()) rows are written inline, so the sink is safe to use without a
+    lifespan, e.g. from scripts.
+    """
+
+    def __init__(self, session_factory, queue_size=HISTORY_QUEUE_SIZE, batch_size=HISTORY_BATCH_SIZE,
+                 flush_interval_ms=HISTORY_FLUSH_INTERVAL_MS, overflow_policy=HISTORY_OVERFLOW_POLICY):
+        self.session_factory = session_factory
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval_ms / 1000
+        self.overflow_policy = overflow_policy
+        self.listeners = []  # called with each list of written rows
+        self._queue = None
+        self._task = None
+        self.stats = {"enqueued": 0, "written": 0, "flushes": 0, "inline_writes": 0, "dropped": 0, "errors": 0}
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Flush everything still queued, then stop the background task."""
+        if not self.running:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, **fields):
+        """Record one history row. `timestamp` defaults to now, not to when the row is flushed."""
+        fields.setdefault("timestamp", datetime.datetime.utcnow())
+        if not self.running:
+            await self._write_inline([fields])
+            return
+        try:
+            self._queue.put_nowait(fields)
+        except asyncio.QueueFull:
+            if self.overflow_policy == "drop":
+                self.stats["dropped"] += 1
+                return
+            if self.overflow_policy == "block":
+                try:
+                    await asyncio.wait_for(self._queue.put(fields), HISTORY_BLOCK_TIMEOUT_MS / 1000)
+                except asyncio.TimeoutError:
+                    await self._write_inline([fields])
+                    return
+            else:
+                await self._write_inline([fields])
+                return
+        self.stats["enqueued"] += 1
+
+    async def submit_many(self, rows):
+        for fields in rows:
+            await self.submit(**fields)
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            if self._queue.qsize() < self.batch_size:
+                # Give concurrent requests a moment to join this batch
+                await asyncio.sleep(self.flush_interval)
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+    async def _flush(self, batch):
+        try:
+            with metrics.stage("history_commit"):
+                await run_in_threadpool(self._insert, batch)
+        except Exception:
+            logger.exception("history flush failed rows=%d", len(batch))
+            self.stats["errors"] += 1
+            return
+        self.stats["flushes"] += 1
+        self.stats["written"] += len(batch)
+        self._notify(batch)
+
+    async def _write_inline(self, rows):
+        with metrics.stage("history_commit"):
+            await run_in_threadpool(self._insert, rows)
+        self.stats["inline_writes"] += len(rows)
+        self.stats["written"] += len(rows)
+        self._notify(rows)
+
+    def _insert(self, rows):
+        db = self.session_factory()
+        try:
+            db.execute(insert(models.TranslationHistory), rows)
+            db.commit()
+        finally:
+            db.close()
+
+    def _notify(self, rows):
+        for listener in self.listeners:
+            try:
+                listener(rows)
+            except Exception:
+                logger.exception("history listener failed")
+
+    def snapshot(self):
+        return {**self.stats, "queued": self._queue.qsize() if self.running else 0}
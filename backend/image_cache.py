@@ -0,0 +1,132 @@
+import math
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+IMAGE_CACHE_ENTRIES = int(os.getenv("IMAGE_CACHE_ENTRIES", 512))
+# Largest pHash Hamming distance (of 64 bits) still looked at as the same image
+IMAGE_CACHE_MAX_DISTANCE = int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", 6))
+# Largest mean difference (0-255) of any 4x4 block of the 128px grayscale thumbnails.
+# Re-encoding, resizing and brightness changes stay under ~13; one changed
+# price on a menu scored 22, a different menu with the same layout 55.
+IMAGE_CACHE_MAX_BLOCK_DIFF = int(os.getenv("IMAGE_CACHE_MAX_BLOCK_DIFF", 16))
+
+HASH_BITS = 64
+DCT_SIZE = 32
+DCT_KEEP = 8
+THUMB_SIZE = 128
+BLOCK = 4
+_COS = [[math.cos(math.pi * (2 * x + 1) * u / (2 * DCT_SIZE)) for x in range(DCT_SIZE)] for u in range(DCT_KEEP)]
+
+Fingerprint = namedtuple("Fingerprint", "phash thumbnail")
+
+
+def phash(gray) -> int:
+    """64-bit DCT perceptual hash of a grayscale image: low frequencies above/below their median."""
+    import PIL.Image
+    pixels = gray.resize((DCT_SIZE, DCT_SIZE), PIL.Image.BOX).tobytes()
+    # Separable 2D DCT, keeping only the DCT_KEEP x DCT_KEEP lowest frequencies
+    rows = [
+        [sum(c * p for c, p in zip(_COS[u], pixels[y * DCT_SIZE:(y + 1) * DCT_SIZE])) for u in range(DCT_KEEP)]
+        for y in range(DCT_SIZE)
+    ]
+    coefficients = [
+        sum(_COS[v][y] * rows[y][u] for y in range(DCT_SIZE)) for v in range(DCT_KEEP) for u in range(DCT_KEEP)
+    ]
+    # The DC term is overall brightness; leave it out of the median
+    ac = sorted(coefficients[1:])
+    median = ac[len(ac) // 2]
+    bits = 0
+    for value in coefficients:
+        bits = (bits << 1) | (value > median)
+    return bits
+
+
+def fingerprint(image) -> Fingerprint:
+    """pHash for candidate lookup plus a small thumbnail to verify candidates with."""
+    import PIL.Image
+    thumbnail = image.convert("L").resize((THUMB_SIZE, THUMB_SIZE), PIL.Image.BOX)
+    return Fingerprint(phash(thumbnail), thumbnail)
+
+
+def _max_block_diff(a, b) -> int:
+    import PIL.ImageChops
+    return PIL.ImageChops.difference(a, b).reduce(BLOCK).getextrema()[1]
+
+
+class ImageResultCache:
+    """Vision results for images seen before, matched perceptually, evicted least-recently-used first.
+
+    pHashes survive re-encoding and resizing but barely change when only
+    the text in an image does, so a pHash match is just a candidate: it is
+    served only if no block of the thumbnails differs by more than
+    max_block_diff. Candidates are found by multi-index hashing: the hash is
+    cut into max_distance + 1 chunks, and by pigeonhole any hash within
+    max_distance agrees with the query exactly on at least one of them.
+    """
+
+    def __init__(self, max_entries=IMAGE_CACHE_ENTRIES, max_distance=IMAGE_CACHE_MAX_DISTANCE,
+                 max_block_diff=IMAGE_CACHE_MAX_BLOCK_DIFF):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.max_block_diff = max_block_diff
+        chunks = max_distance + 1
+        self._chunks = [
+            (HASH_BITS * i // chunks, (1 << (HASH_BITS * (i + 1) // chunks - HASH_BITS * i // chunks)) - 1)
+            for i in range(chunks)
+        ]
+        self._entries = OrderedDict()  # id -> (variant, fingerprint, result)
+        self._tables = [{} for _ in self._chunks]  # (variant, chunk value) -> set of ids
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "rejected": 0, "stores": 0, "evictions": 0}
+
+    def _keys(self, variant, bits):
+        return [(variant, (bits >> shift) & mask) for shift, mask in self._chunks]
+
+    def get(self, fp: Fingerprint, variant: str):
+        """Cached result for a perceptually identical image under the same prompt, or None."""
+        with self._lock:
+            candidates = set()
+            for table, key in zip(self._tables, self._keys(variant, fp.phash)):
+                candidates.update(table.get(key, ()))
+            near = []
+            for entry_id in candidates:
+                _, other, result = self._entries[entry_id]
+                distance = bin(fp.phash ^ other.phash).count("1")
+                if distance <= self.max_distance:
+                    near.append((distance, entry_id, other, result))
+        for distance, entry_id, other, result in sorted(near, key=lambda n: n[:2]):
+            if _max_block_diff(fp.thumbnail, other.thumbnail) <= self.max_block_diff:
+                with self._lock:
+                    if entry_id in self._entries:
+                        self._entries.move_to_end(entry_id)
+                self.stats["hits"] += 1
+                return result
+            self.stats["rejected"] += 1
+        self.stats["misses"] += 1
+        return None
+
+    def put(self, fp: Fingerprint, variant: str, result):
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (variant, fp, result)
+            for table, key in zip(self._tables, self._keys(variant, fp.phash)):
+                table.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._evict()
+        self.stats["stores"] += 1
+
+    def _evict(self):
+        entry_id, (variant, fp, _) = self._entries.popitem(last=False)
+        for table, key in zip(self._tables, self._keys(variant, fp.phash)):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[key]
+        self.stats["evictions"] += 1
+
+    def snapshot(self):
+        return {**self.stats, "entries": len(self._entries)}
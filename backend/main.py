@@ -1,25 +1,55 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request
-from fastapi.responses import JSONResponse
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Form, Request, WebSocket, WebSocketDisconnect, Query
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+from starlette.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
+from pydantic import BaseModel
 from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import hmac
+import inspect
+import json
+import logging
 import sys
+import threading
 import os
+import time
 import traceback
 
 # Add current directory to sys.path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Per-request logging (TTS details, provider errors) is gated by level so it costs nothing when off
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+logging.basicConfig(level=LOG_LEVEL, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("linguaflow")
+
+# Startup/shutdown hooks, registered below once the app modules import cleanly
+startup_hooks = []
+shutdown_hooks = []
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    for hook in startup_hooks:
+        result = hook()
+        if inspect.isawaitable(result):
+            await result
+    yield
+    for hook in reversed(shutdown_hooks):
+        result = hook()
+        if inspect.isawaitable(result):
+            await result
+
 # Initialize FastAPI app
 # Vercel deployment: root_path="/api"
-app = FastAPI(title="Live Multimodal Translation API", version="1.0.0", root_path="/api")
+app = FastAPI(title="Live Multimodal Translation API", version="1.0.0", root_path="/api", lifespan=lifespan)
 
 # Global Exception Handler
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
-    print(f"GLOBAL ERROR: {exc}")
-    traceback.print_exc()
+    logger.error("unhandled error method=%s path=%s", request.method, request.url.path, exc_info=exc)
     return JSONResponse(
         status_code=500,
         content={
@@ -49,187 +79,762 @@ def root():
     return {"message": "Welcome to LinguaFlow API"}
 
 try:
-    import models, database, auth
-    from services import openai_service, gemini_service
-    import google.generativeai as genai
+    import models, database, auth, translation_cache, singleflight, audio_cache, pagination, history_writer, history_search, fuzzy_memory, image_cache
+    import language_detection, voice_stream, rate_limit
+    from sqlalchemy import func, or_, and_
+    from services import openai_service, gemini_service, batching, chunking, router, clients, prompts, metrics
     from database import engine, get_db
-    import base64
-    import shutil
-    import PIL.Image
-    import io
+    import uploads
 
     # Select AI Provider
     AI_PROVIDER = os.getenv("AI_PROVIDER", "gemini").lower()
     if AI_PROVIDER == "openai":
-        ai_service = openai_service
+        preferred_service = openai_service
     else:
-        ai_service = gemini_service
+        preferred_service = gemini_service
 
-    # Create tables
-    # Critical for in-memory DB
-    try:
-        models.Base.metadata.create_all(bind=engine)
-        print("Database tables created successfully.")
-    except Exception as e:
-        print(f"CRITICAL: Database creation failed: {e}")
-        traceback.print_exc()
+    # Other configured providers back up the preferred one (failover, hedging, circuit breaking)
+    providers = [preferred_service]
+    if os.getenv("AI_PROVIDER_FAILOVER", "true").lower() in ("1", "true", "yes"):
+        providers += [p for p in (gemini_service, openai_service) if p is not preferred_service and p.is_configured()]
+    # Request limits per user and endpoint, plus a provider quota budget shared by all calls
+    limit_backend = rate_limit.make_backend()
+    user_limits = rate_limit.UserRateLimiter(limit_backend)
+    provider_budget = rate_limit.ProviderBudget(limit_backend)
+    ai_service = router.ProviderRouter(providers, preferred=preferred_service, admission=provider_budget.admit)
+    # Service modules import their SDKs on first use; warming up the preferred one moves that
+    # out of the first request, while fallback providers only load if a call fails over
+    startup_hooks.append(preferred_service.warm_up)
 
-    oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+    # Per-route latency histograms and a Server-Timing header on every response
+    app.add_middleware(metrics.TimingMiddleware)
+
+    schema_ready = False
+    schema_lock = threading.Lock()
+    history_index = history_search.make_search(engine)
+
+    def init_database():
+        """Create missing tables and indexes (critical for the in-memory DB). Runs once per process."""
+        global schema_ready, history_index
+        with schema_lock:
+            if schema_ready:
+                return
+            try:
+                models.Base.metadata.create_all(bind=engine)
+                # create_all skips indexes on tables that already exist
+                for index in models.TranslationHistory.__table__.indexes:
+                    index.create(bind=engine, checkfirst=True)
+                history_index = history_search.install(history_index, engine)
+                schema_ready = True
+                logger.info("database tables created")
+            except Exception:
+                logger.exception("database creation failed")
+
+    # At startup rather than import, which every cold start pays for, and before the history writer starts
+    startup_hooks.insert(0, lambda: run_in_threadpool(init_database))
+
+    class SchemaMiddleware:
+        """Creates the schema on the first request when no lifespan startup ran (some serverless runtimes, test clients)."""
+
+        def __init__(self, app):
+            self.app = app
+
+        async def __call__(self, scope, receive, send):
+            if not schema_ready and scope["type"] != "lifespan":
+                await run_in_threadpool(init_database)
+            await self.app(scope, receive, send)
+
+    app.add_middleware(SchemaMiddleware)
 
-    def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-        credentials_exception = HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
+    translations = translation_cache.TranslationCache(database.SessionLocal)
+    history_sink = history_writer.HistoryWriter(database.SessionLocal)
+    startup_hooks.append(history_sink.start)
+    # Near-duplicate inputs reuse prior translations; rows join the index as history is written
+    memory = fuzzy_memory.FuzzyMemory()
+    history_sink.listeners.append(memory.on_history_written)
+
+    async def load_memory():
+        try:
+            count = await run_in_threadpool(memory.load, database.SessionLocal)
+            logger.info("fuzzy memory indexed %d history rows", count)
+        except Exception as e:
+            logger.warning("fuzzy memory load failed: %s", e)
+
+    memory_load = None
+
+    async def start_memory_load():
+        global memory_load
+        # In the background: requests are served meanwhile, just without fuzzy matches
+        memory_load = asyncio.create_task(load_memory())
+
+    startup_hooks.append(start_memory_load)
+    shutdown_hooks.append(history_sink.stop)
+    shutdown_hooks.append(auth.shutdown_hash_executor)
+    shutdown_hooks.append(gemini_service.uploaded_files.close)
+    translation_flights = singleflight.SingleFlight()
+    tts_flights = singleflight.SingleFlight()
+    tts_audio = audio_cache.AudioCache()
+    image_results = image_cache.ImageResultCache()
+
+    def translation_key(text: str, target_language: str):
+        return translation_cache.make_key(
+            text,
+            ai_service.resolve_target_language(target_language),
+            ai_service.PROVIDER,
+            ai_service.MODEL_NAME,
         )
+
+    def source_language_of(text: str):
+        """Locally detected language of `text` for history rows, or "auto" when unsure."""
+        detection = language_detection.detect(text)
+        return detection.language if detection.confident else "auto"
+
+    async def generate_text(contents):
+        """Gemini-only prompts (image, detection, pronunciation), metered like routed calls. None on failure."""
+        await provider_budget.admit("generate_text_async", (contents,))
+        start = time.perf_counter()
         try:
-            payload = auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
+            result = await gemini_service.generate_text_async(contents)
+        except Exception as e:
+            logger.warning("generate_text failed error=%s", e)
+            result = None
+        metrics.record_provider_call(gemini_service.PROVIDER, "generate_text_async", result is not None, time.perf_counter() - start)
+        return result
+
+    async def cached_translation(key: str):
+        cached = translations.get_memory(key)
+        if cached is None:
+            with metrics.stage("cache_lookup"):
+                cached = await run_in_threadpool(translations.get_persistent, key)
+        return cached
+
+    async def translate_with_cache(text: str, target_language: str, bypass_cache: bool = False, reference=None):
+        """Translate via the configured provider, consulting the translation cache first.
+
+        `reference` is a (source, translation) pair passed to the model as an example.
+        """
+        key = translation_key(text, target_language)
+        if not bypass_cache:
+            cached = await cached_translation(key)
+            if cached is not None:
+                return cached
+
+        async def fetch():
+            translated = await ai_service.translate_text_async(text, target_language, reference=reference)
+            if translated:
+                await run_in_threadpool(
+                    translations.set, key, translated, ai_service.PROVIDER, ai_service.MODEL_NAME, target_language
+                )
+            return translated
+
+        # Identical requests already in flight share that provider call
+        return await translation_flights.do(key, fetch)
+
+    async def translate_with_memory(user_id, text: str, target_language: str, bypass_cache: bool = False):
+        """translate_with_cache, falling back to the user's fuzzy memory on a cache miss. Returns (translation, match or None)."""
+        if bypass_cache:
+            return await translate_with_cache(text, target_language, bypass_cache=True), None
+        cached = await cached_translation(translation_key(text, target_language))
+        if cached is not None:
+            return cached, None
+        with metrics.stage("memory_lookup"):
+            match = memory.lookup(user_id, text, target_language)
+        if match is not None:
+            metrics.memory_match_score.labels("served" if match.servable else "reference").observe(match.score)
+            if match.servable:
+                return match.translation, match
+        reference = (match.source, match.translation) if match else None
+        # The cache was just checked; skip straight to the provider
+        return await translate_with_cache(text, target_language, bypass_cache=True, reference=reference), match
+
+    oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+    principals = auth.PrincipalCache()
+
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+    def load_principal(email: str):
+        db = database.SessionLocal()
+        try:
+            user = db.query(models.User).filter(models.User.email == email).first()
+            return auth.Principal(id=user.id, email=user.email) if user else None
+        finally:
+            db.close()
+
+    async def authenticate_token(token: str) -> auth.Principal:
+        try:
+            with metrics.stage("jwt_decode"):
+                payload = auth.jwt.decode(token, auth.SECRET_KEY, algorithms=[auth.ALGORITHM])
             email: str = payload.get("sub")
             if email is None:
                 raise credentials_exception
         except auth.JWTError:
             raise credentials_exception
-        user = db.query(models.User).filter(models.User.email == email).first()
-        if user is None:
-            raise credentials_exception
-        return user
+        user_id = payload.get("uid")
+        if auth.STATELESS_TOKENS and user_id is not None:
+            return auth.Principal(id=user_id, email=email)
+        principal = principals.get(email)
+        if principal is None:
+            with metrics.stage("user_lookup"):
+                principal = await run_in_threadpool(load_principal, email)
+            if principal is None:
+                raise credentials_exception
+            principals.set(principal)
+        return principal
+
+    async def get_current_user(token: str = Depends(oauth2_scheme)):
+        return await authenticate_token(token)
+
+    # Batch and document requests yield provider budget to interactive ones
+    BULK_ROUTES = {"/translate/batch", "/translate/document"}
+
+    async def rate_limited_user(request: Request, current_user: auth.Principal = Depends(get_current_user)):
+        route = request.scope["route"].path
+        await user_limits.check(current_user.id, route)
+        if route in BULK_ROUTES:
+            rate_limit.request_priority.set(rate_limit.BULK)
+        return current_user
+
+    @app.exception_handler(rate_limit.RateLimited)
+    async def rate_limited_handler(request: Request, exc: rate_limit.RateLimited):
+        return JSONResponse(
+            status_code=429,
+            content={"detail": exc.detail},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
+
+    @app.exception_handler(auth.PasswordHasherBusy)
+    async def password_hasher_busy_handler(request: Request, exc: auth.PasswordHasherBusy):
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Too many concurrent sign-ins, please retry"},
+            headers={"Retry-After": "1"},
+        )
+
+    # Sign-up and login hold no database connection while bcrypt runs: under a
+    # login storm every queued hash would otherwise pin one and starve the pool
+    def load_credentials(email: str):
+        db = database.SessionLocal()
+        try:
+            return (
+                db.query(models.User.id, models.User.email, models.User.hashed_password)
+                .filter(models.User.email == email)
+                .first()
+            )
+        finally:
+            db.close()
+
+    def save_user(email: str, hashed_password: str):
+        db = database.SessionLocal()
+        try:
+            db.add(models.User(email=email, hashed_password=hashed_password))
+            db.commit()
+        finally:
+            db.close()
 
     @app.post("/users", response_model=dict)
-    def create_user(user: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+    async def create_user(user: OAuth2PasswordRequestForm = Depends()):
         # Using OAuth2PasswordRequestForm for simplicity, treating username as email
-        db_user = db.query(models.User).filter(models.User.email == user.username).first()
-        if db_user:
+        if await run_in_threadpool(load_credentials, user.username):
             raise HTTPException(status_code=400, detail="Email already registered")
-        hashed_password = auth.get_password_hash(user.password)
-        db_user = models.User(email=user.username, hashed_password=hashed_password)
-        db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        hashed_password = await auth.get_password_hash_async(user.password)
+        await run_in_threadpool(save_user, user.username, hashed_password)
+        principals.invalidate(user.username)
         return {"message": "User created successfully"}
 
     @app.post("/token")
-    def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-        user = db.query(models.User).filter(models.User.email == form_data.username).first()
-        if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
+        user = await run_in_threadpool(load_credentials, form_data.username)
+        if not user or not await auth.verify_password_async(form_data.password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Incorrect username or password",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        access_token = auth.create_access_token(data={"sub": user.email})
+        access_token = auth.create_access_token(data={"sub": user.email, "uid": user.id})
         return {"access_token": access_token, "token_type": "bearer"}
 
     @app.post("/translate/text")
-    def translate_text_endpoint(
+    async def translate_text_endpoint(
         text: str = Form(...),
         target_language: str = Form(...),
-        current_user: models.User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        bypass_cache: bool = Form(False),
+        current_user: auth.Principal = Depends(rate_limited_user)
     ):
-        translated = ai_service.translate_text(text, target_language)
+        translated, match = await translate_with_memory(current_user.id, text, target_language, bypass_cache)
         if not translated:
             raise HTTPException(status_code=500, detail="Translation failed")
         
-        # Save to history
-        history = models.TranslationHistory(
+        # Save to history (write-behind)
+        await history_sink.submit(
             user_id=current_user.id,
             input_type="text",
-            source_language="auto",
+            source_language=source_language_of(text),
+            target_language=target_language,
+            original_content=text,
+            translated_content=translated
+        )
+
+        result = {"translated_text": translated}
+        if match is not None:
+            result["memory_match"] = {"score": match.score, "served": match.servable}
+        return result
+
+    class BatchSegment(BaseModel):
+        text: str
+        target_language: str
+
+    class BatchTranslationRequest(BaseModel):
+        segments: List[BatchSegment]
+        bypass_cache: bool = False
+
+    MAX_BATCH_REQUEST_SEGMENTS = int(os.getenv("BATCH_MAX_REQUEST_SEGMENTS", 1000))
+
+    async def translate_distinct(texts: List[str], target_language: str):
+        """Translate distinct texts into one language using as few provider calls as the packing budget allows."""
+        results = [None] * len(texts)
+
+        async def run_chunk(indexes):
+            chunk = [texts[i] for i in indexes]
+            translated = None
+            if len(chunk) > 1:
+                translated = await ai_service.translate_batch_async(chunk, target_language)
+            if translated is None:
+                # Single segment, or the batched reply could not be split reliably
+                translated = await asyncio.gather(*[ai_service.translate_text_async(t, target_language) for t in chunk])
+            for index, value in zip(indexes, translated):
+                results[index] = value
+
+        await asyncio.gather(*[run_chunk(indexes) for indexes in batching.pack_segments(texts)])
+        return results
+
+    @app.post("/translate/batch")
+    async def translate_batch_endpoint(
+        request: BatchTranslationRequest,
+        current_user: auth.Principal = Depends(rate_limited_user)
+    ):
+        segments = request.segments
+        if len(segments) > MAX_BATCH_REQUEST_SEGMENTS:
+            raise HTTPException(status_code=413, detail=f"At most {MAX_BATCH_REQUEST_SEGMENTS} segments per batch")
+        if not segments:
+            return {"translations": []}
+
+        resolved = [ai_service.resolve_target_language(seg.target_language) for seg in segments]
+        keys = [
+            translation_cache.make_key(seg.text, target, ai_service.PROVIDER, ai_service.MODEL_NAME)
+            for seg, target in zip(segments, resolved)
+        ]
+        results = [None] * len(segments)
+        if not request.bypass_cache:
+            results = [translations.get_memory(key) for key in keys]
+            misses = [i for i, value in enumerate(results) if value is None]
+            if misses:
+                found = await run_in_threadpool(lambda: [translations.get_persistent(keys[i]) for i in misses])
+                for i, value in zip(misses, found):
+                    results[i] = value
+
+        # Group what is left by resolved target language, de-duplicating repeated segments
+        groups = {}
+        for i, value in enumerate(results):
+            if value is None:
+                target_language, pending = groups.setdefault(resolved[i], (segments[i].target_language, {}))
+                pending.setdefault(keys[i], []).append(i)
+
+        async def run_group(target_language, pending):
+            indexes = list(pending.values())
+            translated = await translate_distinct([segments[group[0]].text for group in indexes], target_language)
+            for group, value in zip(indexes, translated):
+                for i in group:
+                    results[i] = value
+
+        await asyncio.gather(*[run_group(target, pending) for target, pending in groups.values()])
+        if all(value is None for value in results):
+            raise HTTPException(status_code=500, detail="Translation failed")
+
+        fresh = [
+            (keys[group[0]], results[group[0]], ai_service.PROVIDER, ai_service.MODEL_NAME, target_language)
+            for target_language, pending in groups.values()
+            for group in pending.values()
+            if results[group[0]]
+        ]
+        if fresh:
+            await run_in_threadpool(translations.set_many, fresh)
+
+        # Save to history; the sink flushes these as bulk inserts
+        saved = [(seg, value) for seg, value in zip(segments, results) if value]
+        sources = await run_in_threadpool(lambda: [source_language_of(seg.text) for seg, _ in saved])
+        await history_sink.submit_many([
+            dict(
+                user_id=current_user.id,
+                input_type="text",
+                source_language=source,
+                target_language=seg.target_language,
+                original_content=seg.text,
+                translated_content=value
+            )
+            for (seg, value), source in zip(saved, sources)
+        ])
+
+        return {"translations": [{"translated_text": value} for value in results]}
+
+    @app.post("/translate/document")
+    async def translate_document_endpoint(
+        text: str = Form(...),
+        target_language: str = Form(...),
+        bypass_cache: bool = Form(False),
+        current_user: auth.Principal = Depends(rate_limited_user)
+    ):
+        """Translate a long document chunk by chunk, several chunks at a time.
+
+        Chunks are cached individually, so re-translating an edited document
+        only sends the changed chunks to the provider.
+        """
+        if len(text) > chunking.DOCUMENT_MAX_CHARS:
+            raise HTTPException(status_code=413, detail=f"Documents are limited to {chunking.DOCUMENT_MAX_CHARS} characters")
+        leading, chunks = await run_in_threadpool(chunking.split_document, text)
+        slots = asyncio.Semaphore(chunking.DOCUMENT_MAX_CONCURRENCY)
+        cached_chunks = 0
+
+        async def translate_chunk(chunk):
+            nonlocal cached_chunks
+            if not bypass_cache:
+                cached = await cached_translation(translation_key(chunk, target_language))
+                if cached is not None:
+                    cached_chunks += 1
+                    return cached
+            async with slots:
+                return await translate_with_cache(chunk, target_language, bypass_cache=True)
+
+        tasks = [asyncio.ensure_future(translate_chunk(chunk)) for chunk, _ in chunks]
+        try:
+            results = await asyncio.gather(*tasks)
+        finally:
+            # One failed chunk (e.g. rate limited) fails the document; stop the rest
+            for task in tasks:
+                task.cancel()
+        if not all(results):
+            raise HTTPException(status_code=500, detail="Translation failed")
+        # Whitespace between chunks is restored verbatim
+        translated = leading + "".join(value + separator for value, (_, separator) in zip(results, chunks))
+
+        await history_sink.submit(
+            user_id=current_user.id,
+            input_type="document",
+            source_language=source_language_of(text),
             target_language=target_language,
             original_content=text,
             translated_content=translated
         )
-        db.add(history)
-        db.commit()
-        
-        return {"translated_text": translated}
+
+        return {"translated_text": translated, "chunks": len(chunks), "cached_chunks": cached_chunks}
+
+    async def stream_translation(text: str, target_language: str, user_id: int, bypass_cache: bool = False):
+        """Yield ("delta", fragment) events as the provider streams, then ("done", full_text).
+
+        History and cache are written only once the stream completes; if the
+        consumer goes away first the generator is closed and nothing is saved.
+        """
+        key = translation_key(text, target_language)
+        translated = None
+        if not bypass_cache:
+            translated = translations.get_memory(key)
+            if translated is None:
+                translated = await run_in_threadpool(translations.get_persistent, key)
+        if translated is not None:
+            yield "delta", translated
+        else:
+            parts = []
+            async for fragment in ai_service.translate_text_stream(text, target_language):
+                parts.append(fragment)
+                yield "delta", fragment
+            translated = "".join(parts).strip()
+            if not translated:
+                raise ValueError("Empty translation")
+            await run_in_threadpool(
+                translations.set, key, translated, ai_service.PROVIDER, ai_service.MODEL_NAME, target_language
+            )
+
+        await history_sink.submit(
+            user_id=user_id,
+            input_type="text",
+            source_language=source_language_of(text),
+            target_language=target_language,
+            original_content=text,
+            translated_content=translated
+        )
+        yield "done", translated
+
+    @app.post("/translate/text/stream")
+    async def translate_text_stream_endpoint(
+        request: Request,
+        text: str = Form(...),
+        target_language: str = Form(...),
+        bypass_cache: bool = Form(False),
+        current_user: auth.Principal = Depends(rate_limited_user)
+    ):
+        """Server-Sent Events: `delta` events carry text fragments, `done` carries the full translation."""
+        user_id = current_user.id
+
+        async def events():
+            try:
+                async for event, value in stream_translation(text, target_language, user_id, bypass_cache):
+                    if await request.is_disconnected():
+                        return
+                    payload = {"text": value} if event == "delta" else {"translated_text": value}
+                    yield f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+            except rate_limit.RateLimited as e:
+                yield f"event: error\ndata: {json.dumps({'detail': e.detail, 'retry_after': e.retry_after})}\n\n"
+            except Exception as e:
+                logger.warning("streaming translation failed error=%s", e)
+                yield f"event: error\ndata: {json.dumps({'detail': 'Translation failed'})}\n\n"
+
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
+    @app.websocket("/translate/text/ws")
+    async def translate_text_websocket(websocket: WebSocket, token: str = Query(...)):
+        """Streaming translation over a WebSocket, authenticated with `?token=<access token>`.
+
+        Send `{"text": ..., "target_language": ..., "bypass_cache": false}` and receive
+        `{"type": "delta", "text": ...}` messages followed by `{"type": "done", "translated_text": ...}`.
+        Any message sent while a translation is streaming cancels it; `{"type": "cancel"}`
+        cancels without starting a new one.
+        """
+        try:
+            user = await authenticate_token(token)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        await websocket.accept()
+
+        async def relay(message):
+            try:
+                text, target_language = message["text"], message["target_language"]
+            except (KeyError, TypeError):
+                await websocket.send_json({"type": "error", "detail": "text and target_language are required"})
+                return
+            try:
+                await user_limits.check(user.id, "/translate/text/ws")
+                async for event, value in stream_translation(text, target_language, user.id, bool(message.get("bypass_cache"))):
+                    if event == "delta":
+                        await websocket.send_json({"type": "delta", "text": value})
+                    else:
+                        await websocket.send_json({"type": "done", "translated_text": value})
+            except asyncio.CancelledError:
+                raise
+            except rate_limit.RateLimited as e:
+                await websocket.send_json({"type": "error", "detail": e.detail, "retry_after": e.retry_after})
+            except Exception as e:
+                logger.warning("streaming translation failed error=%s", e)
+                await websocket.send_json({"type": "error", "detail": "Translation failed"})
+
+        receive = asyncio.create_task(websocket.receive_json())
+        current = None
+        try:
+            while True:
+                message = await receive
+                receive = asyncio.create_task(websocket.receive_json())
+                if not isinstance(message, dict) or message.get("type") == "cancel":
+                    continue
+                current = asyncio.create_task(relay(message))
+                await asyncio.wait({current, receive}, return_when=asyncio.FIRST_COMPLETED)
+                if not current.done():
+                    # The client sent something (or left) mid-stream: drop this translation
+                    current.cancel()
+        except (WebSocketDisconnect, ValueError):
+            pass
+        finally:
+            for task in (current, receive):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    # Transcribe and translate voice input in one multimodal call where the provider supports it
+    VOICE_SINGLE_CALL = os.getenv("VOICE_SINGLE_CALL", "true").lower() in ("1", "true", "yes")
+
+    async def transcribe_and_translate(audio_path: str, target_language: str):
+        """{"transcript", "translation"} from a single provider call, or None to fall back to two calls."""
+        if not VOICE_SINGLE_CALL:
+            return None
+        result = await ai_service.transcribe_and_translate_async(audio_path, target_language)
+        if result:
+            await run_in_threadpool(
+                translations.set, translation_key(result["transcript"], target_language), result["translation"],
+                ai_service.PROVIDER, ai_service.MODEL_NAME, target_language
+            )
+        return result
 
     @app.post("/translate/voice")
     async def translate_voice_endpoint(
         file: UploadFile = File(...),
         target_language: str = Form(...),
-        current_user: models.User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(rate_limited_user)
     ):
-        # Save temp file
-        temp_filename = f"/tmp/temp_{file.filename}" if os.environ.get("VERCEL") else f"temp_{file.filename}"
-        with open(temp_filename, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
+        # Spool to a uniquely named temp file, removed as soon as it is transcribed
+        async with uploads.spooled_upload(file, uploads.MAX_AUDIO_UPLOAD_BYTES) as temp_filename:
+            combined = await transcribe_and_translate(temp_filename, target_language)
+            transcript = combined["transcript"] if combined else await ai_service.transcribe_audio_async(temp_filename)
             
+        if not transcript:
+             raise HTTPException(status_code=500, detail="Transcription failed")
+             
+        translated = combined["translation"] if combined else await translate_with_cache(transcript, target_language)
+        
+        # Save to history (write-behind)
+        await history_sink.submit(
+            user_id=current_user.id,
+            input_type="voice",
+            source_language=source_language_of(transcript),
+            target_language=target_language,
+            original_content=transcript,
+            translated_content=translated
+        )
+        
+        return {"transcript": transcript, "translated_text": translated}
+
+    @app.websocket("/translate/voice/ws")
+    async def translate_voice_websocket(
+        websocket: WebSocket,
+        token: str = Query(...),
+        target_language: str = Query(...),
+        sample_rate: int = Query(16000)
+    ):
+        """Live voice translation over a WebSocket, authenticated with `?token=<access token>`.
+
+        Send audio as binary messages of raw 16-bit little-endian mono PCM at
+        `sample_rate`. The stream is cut into segments at pauses; for each one
+        the server sends `{"type": "transcript", "segment": n, "text": ...}`
+        and then `{"type": "translation", "segment": n, "text": ...}`, as soon
+        as they are ready. Every segment counts against the user's rate limit;
+        a refused or failed one gets `{"type": "error", "segment": n, "detail":
+        ...}` instead, with `retry_after` seconds when it was rate limited.
+        Send `{"type": "end"}` to finish: the last segment
+        is processed and a final `{"type": "done", "transcript": ...,
+        "translated_text": ...}` message covers the whole session.
+        """
         try:
-            # with open(temp_filename, "rb") as audio_file:
-            transcript = ai_service.transcribe_audio(temp_filename)
-            
+            user = await authenticate_token(token)
+        except HTTPException:
+            await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+            return
+        if sample_rate not in voice_stream.SAMPLE_RATES:
+            await websocket.close(code=status.WS_1003_UNSUPPORTED_DATA)
+            return
+        await websocket.accept()
+
+        segmenter = voice_stream.Segmenter(sample_rate)
+        transcripts, translated_segments, tasks = {}, {}, []
+
+        async def process(index, pcm):
+            try:
+                await translate_segment(index, pcm)
+            except asyncio.CancelledError:
+                raise
+            except rate_limit.RateLimited as e:
+                await websocket.send_json({"type": "error", "segment": index, "detail": e.detail, "retry_after": e.retry_after})
+            except Exception as e:
+                logger.warning("voice segment failed segment=%d error=%s", index, e)
+                await websocket.send_json({"type": "error", "segment": index, "detail": "Translation failed"})
+
+        async def translate_segment(index, pcm):
+            # Each segment costs a request, like a /translate/voice upload
+            await user_limits.check(user.id, "/translate/voice/ws")
+            path = await run_in_threadpool(voice_stream.write_temp_wav, pcm, sample_rate)
+            try:
+                combined = await transcribe_and_translate(path, target_language)
+                transcript = combined["transcript"] if combined else await ai_service.transcribe_audio_async(path)
+            finally:
+                os.remove(path)
             if not transcript:
-                 raise HTTPException(status_code=500, detail="Transcription failed")
-                 
-            translated = ai_service.translate_text(transcript, target_language)
-            
-            # Save to history
-            history = models.TranslationHistory(
-                user_id=current_user.id,
+                await websocket.send_json({"type": "error", "segment": index, "detail": "Transcription failed"})
+                return
+            transcripts[index] = transcript
+            await websocket.send_json({"type": "transcript", "segment": index, "text": transcript})
+            translated = combined["translation"] if combined else await translate_with_cache(transcript, target_language)
+            if not translated:
+                await websocket.send_json({"type": "error", "segment": index, "detail": "Translation failed"})
+                return
+            translated_segments[index] = translated
+            await websocket.send_json({"type": "translation", "segment": index, "text": translated})
+
+        def start(segments):
+            # Segments are processed concurrently; the index lets the client order them
+            for pcm in segments:
+                tasks.append(asyncio.create_task(process(len(tasks), pcm)))
+
+        try:
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    raise WebSocketDisconnect(message.get("code", 1000))
+                if message.get("bytes"):
+                    start(segmenter.feed(message["bytes"]))
+                elif message.get("text"):
+                    try:
+                        command = json.loads(message["text"])
+                    except ValueError:
+                        continue
+                    if isinstance(command, dict) and command.get("type") == "end":
+                        break
+            final = segmenter.flush()
+            start([final] if final else [])
+            await asyncio.gather(*tasks, return_exceptions=True)
+            transcript = " ".join(transcripts[i] for i in sorted(transcripts))
+            translated = " ".join(translated_segments[i] for i in sorted(translated_segments))
+            await websocket.send_json({"type": "done", "transcript": transcript, "translated_text": translated})
+            await websocket.close()
+        except WebSocketDisconnect:
+            # Segments already sent for processing still finish and are saved
+            await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+        if transcripts:
+            transcript = " ".join(transcripts[i] for i in sorted(transcripts))
+            await history_sink.submit(
+                user_id=user.id,
                 input_type="voice",
-                source_language="auto",
+                source_language=source_language_of(transcript),
                 target_language=target_language,
                 original_content=transcript,
-                translated_content=translated
+                translated_content=" ".join(translated_segments[i] for i in sorted(translated_segments))
             )
-            db.add(history)
-            db.commit()
-            
-            return {"transcript": transcript, "translated_text": translated}
-        finally:
-            if os.path.exists(temp_filename):
-                os.remove(temp_filename)
 
     @app.post("/translate/image")
     async def translate_image_endpoint(
         file: UploadFile = File(...),
         target_language: str = Form(default="English"),
-        current_user: models.User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        current_user: auth.Principal = Depends(rate_limited_user)
     ):
-        contents = await file.read()
-        base64_image = base64.b64encode(contents).decode('utf-8')
-        
-        # Call analyze_image with target language
-        try:
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            image_bytes = base64.b64decode(base64_image)
-            image = PIL.Image.open(io.BytesIO(image_bytes))
-            
-            # Handle romanized versions
-            romanized_map = {
-                'hinglish': 'Hindi',
-                'romanized marathi': 'Marathi',
-                'romanized bengali': 'Bengali',
-                'romanized tamil': 'Tamil',
-                'romanized telugu': 'Telugu',
-                'romanized gujarati': 'Gujarati',
-                'romanized kannada': 'Kannada',
-                'romanized malayalam': 'Malayalam',
-                'romanized punjabi': 'Punjabi',
-                'romanized urdu': 'Urdu',
-                'romanized odia': 'Odia',
-                'romanized assamese': 'Assamese',
-                'romanized japanese': 'Japanese'
-            }
-            
-            target_lower = target_language.lower()
-            if target_lower in romanized_map:
-                base_lang = romanized_map[target_lower]
-                prompt = f"Extract all text from this image. If there is text, translate it to {base_lang} but write it using English letters (romanized {base_lang}). If there is no text, describe the image in romanized {base_lang} (using English letters)."
-            else:
-                prompt = f"Extract all text from this image and translate it to {target_language}. If there is no text, describe the image in {target_language}."
-            
-            response = model.generate_content([prompt, image])
-            analysis = response.text.strip()
-        except Exception as e:
-            print(f"Error analyzing image: {e}")
-            raise HTTPException(status_code=500, detail="Image analysis failed")
-            
-        # Save to history
-        history = models.TranslationHistory(
+        uploads.check_size(file, uploads.MAX_IMAGE_UPLOAD_BYTES)
+        # Decode straight from the spooled upload and downscale for the model
+        image = await run_in_threadpool(uploads.decode_image, file.file)
+        prompt = prompts.image_prompt(target_language)
+
+        def lookup():
+            fingerprint = image_cache.fingerprint(image)
+            return fingerprint, image_results.get(fingerprint, prompt)
+
+        # Re-uploads of the same menu or sign, even re-encoded or resized, reuse the earlier result
+        with metrics.stage("image_cache_lookup"):
+            fingerprint, analysis = await run_in_threadpool(lookup)
+        if analysis is None:
+            image_blob = await run_in_threadpool(uploads.encode_image, image)
+            analysis = await generate_text([prompt, image_blob])
+            if not analysis:
+                raise HTTPException(status_code=500, detail="Image analysis failed")
+            image_results.put(fingerprint, prompt, analysis)
+
+        # Save to history (write-behind)
+        await history_sink.submit(
             user_id=current_user.id,
             input_type="image",
             source_language="auto",
@@ -237,62 +842,252 @@ try:
             original_content="[Image Upload]",
             translated_content=analysis
         )
-        db.add(history)
-        db.commit()
         
         return {"analysis": analysis}
 
     @app.post("/tts")
-    def tts_endpoint(
+    async def tts_endpoint(
         text: str = Form(...),
         language: str = Form(...),
-        current_user: models.User = Depends(get_current_user),
-        db: Session = Depends(get_db)
+        stream: bool = Form(False),
+        current_user: auth.Principal = Depends(rate_limited_user)
     ):
-        print(f"TTS Request: text='{text[:50]}...', language='{language}'")
-        audio_content = ai_service.text_to_speech(text, language)
+        logger.debug("tts request chars=%d language=%s stream=%s", len(text), language, stream)
+        key = audio_cache.make_key(
+            text, ai_service.tts_language_code(language), ai_service.PROVIDER, ai_service.TTS_VOICE
+        )
+        cached_file = await run_in_threadpool(tts_audio.get, key)
+        if cached_file:
+            # Streamed from the descriptor opened by the lookup, so a concurrent eviction cannot break it
+            return StreamingResponse(
+                audio_cache.read_chunks(cached_file),
+                media_type="audio/mpeg",
+                headers={"Content-Length": str(os.fstat(cached_file.fileno()).st_size)},
+            )
+
+        if stream:
+            # Relay MP3 segments as they are synthesized, caching the result once complete.
+            # Clips are small, so they are gathered in memory and stored off the event
+            # loop in one go; a failed or abandoned stream is never cached.
+            async def chunks():
+                parts = []
+                async for chunk in ai_service.text_to_speech_stream(text, language):
+                    parts.append(chunk)
+                    yield chunk
+                if parts:
+                    await run_in_threadpool(tts_audio.put, key, b"".join(parts))
+            return StreamingResponse(chunks(), media_type="audio/mpeg")
+
+        async def synthesize():
+            with metrics.stage("tts"):
+                audio = await ai_service.text_to_speech_async(text, language)
+            if audio:
+                await run_in_threadpool(tts_audio.put, key, audio)
+            return audio
+
+        audio_content = await tts_flights.do(key, synthesize)
         if not audio_content:
             raise HTTPException(status_code=500, detail="TTS generation failed")
-        
-        print(f"TTS Response: {len(audio_content)} bytes")
-        from fastapi.responses import Response
+
+        logger.debug("tts response bytes=%d", len(audio_content))
         return Response(content=audio_content, media_type="audio/mpeg")
 
     @app.post("/detect-language")
-    def detect_language_endpoint(
+    async def detect_language_endpoint(
         text: str = Form(...),
-        current_user: models.User = Depends(get_current_user)
+        current_user: auth.Principal = Depends(rate_limited_user)
     ):
-        """Detect the language of input text"""
-        try:
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            prompt = f"Detect the language of this text and return ONLY the language name (e.g., 'Hindi', 'English', 'Spanish'). Text: {text}"
-            response = model.generate_content(prompt)
-            detected_lang = response.text.strip()
-            return {"detected_language": detected_lang}
-        except Exception as e:
-            print(f"Error detecting language: {e}")
+        """Detect the language of input text; the model is only asked when local detection is unsure"""
+        detection = language_detection.detect(text)
+        if detection.confident:
+            return {"detected_language": detection.language, "confidence": round(detection.confidence, 3), "method": "local"}
+        detected_lang = await generate_text(prompts.detect_language_prompt(text))
+        if not detected_lang:
             raise HTTPException(status_code=500, detail="Language detection failed")
+        return {"detected_language": detected_lang, "confidence": None, "method": "model"}
 
     @app.post("/pronunciation")
-    def pronunciation_endpoint(
+    async def pronunciation_endpoint(
         text: str = Form(...),
         target_language: str = Form(...),
-        current_user: models.User = Depends(get_current_user)
+        current_user: auth.Principal = Depends(rate_limited_user)
     ):
         """Get romanized pronunciation guide"""
-        try:
-            model = genai.GenerativeModel('gemini-2.5-flash')
-            prompt = f"Provide a romanized pronunciation guide for this {target_language} text. Show how to pronounce it using English letters. Text: {text}"
-            response = model.generate_content(prompt)
-            return {"pronunciation": response.text.strip()}
-        except Exception as e:
-            print(f"Error generating pronunciation: {e}")
+        pronunciation = await generate_text(prompts.pronunciation_prompt(text, target_language))
+        if not pronunciation:
             raise HTTPException(status_code=500, detail="Pronunciation generation failed")
+        return {"pronunciation": pronunciation}
+
+    @app.get("/cache/stats")
+    def cache_stats():
+        return {
+            "providers": ai_service.snapshot(),
+            "clients": clients.registry.snapshot(),
+            "rate_limits": {"users": user_limits.stats, "provider_budget": provider_budget.snapshot()},
+            "uploaded_files": gemini_service.uploaded_files.snapshot(),
+            "history_writer": history_sink.snapshot(),
+            "translation": translations.snapshot(),
+            "fuzzy_memory": memory.snapshot(),
+            "tts_audio": tts_audio.snapshot(),
+            "image_results": image_results.snapshot(),
+            "coalescing": {"translation": translation_flights.snapshot(), "tts": tts_flights.snapshot()},
+        }
+
+    # Set to require `Authorization: Bearer <token>` on /metrics
+    METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+    @metrics.registry.register_collector
+    def service_metrics():
+        """Samples read from the existing stats counters at scrape time."""
+        translation_stats = translations.stats
+        uploaded = gemini_service.uploaded_files.stats
+        caches = [
+            # (cache, hits, misses); memory misses fall through to the database
+            ("translation_memory", translation_stats["memory_hits"],
+             translation_stats["persistent_hits"] + translation_stats["misses"]),
+            ("translation_db", translation_stats["persistent_hits"], translation_stats["misses"]),
+            ("tts_audio", tts_audio.stats["hits"], tts_audio.stats["misses"]),
+            ("uploaded_files", uploaded["reused"], uploaded["uploads"]),
+            ("fuzzy_memory", memory.stats["served"] + memory.stats["referenced"], memory.stats["misses"]),
+            ("image_results", image_results.stats["hits"], image_results.stats["misses"]),
+        ]
+        yield "linguaflow_cache_lookups_total", "counter", "Cache lookups by outcome", [
+            sample for name, hits, misses in caches
+            for sample in (({"cache": name, "result": "hit"}, hits), ({"cache": name, "result": "miss"}, misses))
+        ]
+        yield "linguaflow_cache_hit_ratio", "gauge", "Share of cache lookups that hit", [
+            ({"cache": name}, hits / (hits + misses) if hits + misses else 0.0) for name, hits, misses in caches
+        ]
+        yield "linguaflow_coalesced_calls_total", "counter", "Provider calls joined to an identical one in flight", [
+            ({"flight": "translation"}, translation_flights.stats["coalesced"]),
+            ({"flight": "tts"}, tts_flights.stats["coalesced"]),
+        ]
+        yield "linguaflow_provider_calls_in_flight", "gauge", "Upstream calls holding a provider slot", [
+            ({"provider": p.PROVIDER}, p.provider_slots.in_flight) for p in providers
+        ]
+        yield "linguaflow_provider_breaker_open", "gauge", "1 while a provider's circuit breaker is not closed", [
+            ({"provider": name}, int(breaker.state != "closed")) for name, breaker in ai_service.breakers.items()
+        ]
+        yield "linguaflow_rate_limited_total", "counter", "Requests refused by rate limits", [
+            ({"scope": "user"}, user_limits.stats["limited"]),
+            ({"scope": "provider"}, provider_budget.stats["refused"]),
+        ]
+        history_stats = history_sink.snapshot()
+        yield "linguaflow_history_queue_depth", "gauge", "History rows waiting to be written", [({}, history_stats["queued"])]
+        yield "linguaflow_history_rows_total", "counter", "History rows by outcome", [
+            ({"outcome": "written"}, history_stats["written"]),
+            ({"outcome": "dropped"}, history_stats["dropped"]),
+        ]
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics_endpoint(request: Request):
+        """Prometheus text format"""
+        if METRICS_TOKEN and not hmac.compare_digest(
+            request.headers.get("authorization", "").encode(), f"Bearer {METRICS_TOKEN}".encode()
+        ):
+            raise HTTPException(status_code=401, detail="Invalid metrics token")
+        return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+    @app.get("/history/search")
+    def search_history(
+        response: Response,
+        q: str = Query(..., min_length=1, max_length=500),
+        limit: int = Query(20, ge=1, le=100),
+        cursor: Optional[str] = None,
+        prefix: bool = False,
+        input_type: Optional[str] = None,
+        target_language: Optional[str] = None,
+        current_user: auth.Principal = Depends(rate_limited_user),
+        db: Session = Depends(get_db)
+    ):
+        """Full-text search over the user's history, best match first, with highlighted snippets.
+
+        Words are ANDed, "quoted text" matches as a phrase and `word*` (or
+        prefix=true for every word) matches by prefix. The next page's
+        cursor is returned in the X-Next-Cursor header.
+        """
+        terms = history_search.parse_query(q, prefix=prefix)
+        if not terms:
+            raise HTTPException(status_code=400, detail="Query has no searchable words")
+        try:
+            offset = pagination.decode_offset_cursor(cursor) if cursor else 0
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+        with metrics.stage("history_search"):
+            rows = history_index.search(db, current_user.id, terms, limit + 1, offset, input_type, target_language)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = pagination.encode_offset_cursor(offset + limit)
+        return rows
 
     @app.get("/history")
-    def get_history(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-        return db.query(models.TranslationHistory).filter(models.TranslationHistory.user_id == current_user.id).order_by(models.TranslationHistory.timestamp.desc()).all()
+    def get_history(
+        request: Request,
+        response: Response,
+        limit: Optional[int] = Query(None, ge=1, le=500),
+        cursor: Optional[str] = None,
+        input_type: Optional[str] = None,
+        target_language: Optional[str] = None,
+        preview_chars: Optional[int] = Query(None, ge=1),
+        current_user: auth.Principal = Depends(get_current_user),
+        db: Session = Depends(get_db)
+    ):
+        """Newest-first history page. The next page's cursor is returned in the X-Next-Cursor header.
+
+        Without `limit` or `cursor` the whole history is returned, as before
+        pagination; a `cursor` alone gets pages of 50. `preview_chars`
+        truncates the content columns in SQL, and a matching If-None-Match
+        short-circuits to 304 before any rows are read.
+        """
+        if limit is None and cursor:
+            limit = 50
+        History = models.TranslationHistory
+        filters = [History.user_id == current_user.id]
+        if input_type:
+            filters.append(History.input_type == input_type)
+        if target_language:
+            filters.append(History.target_language == target_language)
+
+        # History rows are append-only, so the newest matching id versions the result
+        latest_id = db.query(func.max(History.id)).filter(*filters).scalar()
+        etag = pagination.make_etag(current_user.id, latest_id, limit, cursor, input_type, target_language, preview_chars)
+        if request.headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        if cursor:
+            try:
+                cursor_timestamp, cursor_id = pagination.decode_cursor(cursor)
+            except ValueError:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            filters.append(or_(
+                History.timestamp < cursor_timestamp,
+                and_(History.timestamp == cursor_timestamp, History.id < cursor_id),
+            ))
+
+        def content(column):
+            return (func.substr(column, 1, preview_chars) if preview_chars else column).label(column.key)
+
+        query = (
+            db.query(
+                History.id,
+                History.user_id,
+                History.timestamp,
+                History.input_type,
+                History.source_language,
+                History.target_language,
+                content(History.original_content),
+                content(History.translated_content),
+            )
+            .filter(*filters)
+            .order_by(History.timestamp.desc(), History.id.desc())
+        )
+        rows = (query.limit(limit + 1) if limit else query).all()
+        if limit and len(rows) > limit:
+            rows = rows[:limit]
+            response.headers["X-Next-Cursor"] = pagination.encode_cursor(rows[-1].timestamp, rows[-1].id)
+        response.headers["ETag"] = etag
+        return [row._asdict() for row in rows]
 
 except Exception as e:
     print(f"CRITICAL ERROR STARTING APP: {e}")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from database import Base
 import datetime
@@ -25,3 +25,18 @@ class TranslationHistory(Base):
     translated_content = Column(String)
     
     owner = relationship("User", back_populates="history")
+
+    __table_args__ = (
+        # Serves /history keyset pagination: newest first per user, id as tie-breaker
+        Index("ix_translation_history_user_timestamp", "user_id", "timestamp", "id"),
+    )
+
+class TranslationCacheEntry(Base):
+    __tablename__ = "translation_cache"
+
+    key = Column(String, primary_key=True)  # sha256 of text/target/provider/model
+    provider = Column(String)
+    model_name = Column(String)
+    target_language = Column(String)
+    translated_content = Column(String)
+    created_at = Column(DateTime, default=datetime.datetime.utcnow, index=True)
@@ -0,0 +1,40 @@
+import base64
+import datetime
+import hashlib
+
+
+def encode_cursor(timestamp: datetime.datetime, row_id: int) -> str:
+    """Opaque keyset cursor pointing just past (timestamp, id)."""
+    raw = f"{timestamp.isoformat()}|{row_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Inverse of encode_cursor. Raises ValueError for malformed input."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        timestamp, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.datetime.fromisoformat(timestamp), int(row_id)
+    except (UnicodeDecodeError, TypeError) as e:
+        raise ValueError(str(e))
+
+
+def encode_offset_cursor(offset: int) -> str:
+    """Opaque cursor for ranked results, which have no stable keyset to resume from."""
+    return base64.urlsafe_b64encode(f"offset|{offset}".encode()).decode().rstrip("=")
+
+
+def decode_offset_cursor(cursor: str) -> int:
+    """Inverse of encode_offset_cursor. Raises ValueError for malformed input."""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        kind, offset = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+    except (UnicodeDecodeError, TypeError) as e:
+        raise ValueError(str(e))
+    if kind != "offset" or int(offset) < 0:
+        raise ValueError("not an offset cursor")
+    return int(offset)
+
+
+def make_etag(*parts) -> str:
+    return 'W/"' + hashlib.sha1("\x1f".join(str(p) for p in parts).encode()).hexdigest() + '"'
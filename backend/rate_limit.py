@@ -0,0 +1,224 @@
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+
+# Per-user limits apply to each endpoint separately; 0 disables them
+RATE_LIMIT_USER_PER_MINUTE = float(os.getenv("RATE_LIMIT_USER_PER_MINUTE", 120))
+RATE_LIMIT_USER_BURST = int(os.getenv("RATE_LIMIT_USER_BURST", 30))
+# Per-endpoint overrides of the per-minute rate, e.g. "/translate/document=10,/tts=60"
+RATE_LIMIT_OVERRIDES = os.getenv("RATE_LIMIT_OVERRIDES", "")
+# Budget for all provider calls of this deployment, matching the provider's quota; 0 disables
+PROVIDER_RPM = float(os.getenv("PROVIDER_RPM", 0))
+PROVIDER_TPM = float(os.getenv("PROVIDER_TPM", 0))
+# Share of the provider budget only interactive requests may use
+PROVIDER_INTERACTIVE_RESERVE = float(os.getenv("PROVIDER_INTERACTIVE_RESERVE", 0.2))
+# How long a request may queue for provider budget before it is refused
+PROVIDER_QUEUE_MAX_WAIT_MS = int(os.getenv("PROVIDER_QUEUE_MAX_WAIT_MS", 10000))
+# Set to share buckets across workers (requires the `redis` package)
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", 100000))
+
+INTERACTIVE = 0
+BULK = 1
+
+# Priority of the provider calls made while handling the current request
+request_priority = contextvars.ContextVar("request_priority", default=INTERACTIVE)
+
+
+class RateLimited(Exception):
+    def __init__(self, retry_after: float, detail: str = "Rate limit exceeded"):
+        super().__init__(detail)
+        self.retry_after = max(1, math.ceil(retry_after))
+        self.detail = detail
+
+
+class MemoryBackend:
+    """Token buckets in this process."""
+
+    def __init__(self, max_keys=RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    async def take(self, key, rate, capacity, cost=1.0, floor=0.0):
+        """Take `cost` tokens if at least `floor` remain afterwards.
+
+        Returns 0 on success, otherwise the seconds until it would succeed
+        (nothing is taken then). A negative cost returns tokens.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            if cost > 0 and tokens - cost < floor:
+                self._buckets[key] = (tokens, now)
+                return (cost + floor - tokens) / rate
+            self._buckets[key] = (min(capacity, tokens - cost), now)
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return 0.0
+
+    def _prune(self, now):
+        # Buckets idle long enough to have refilled hold no information
+        for key, (tokens, updated) in list(self._buckets.items()):
+            if now - updated > 3600:
+                del self._buckets[key]
+        if len(self._buckets) > self.max_keys:
+            self._buckets.clear()
+
+
+class RedisBackend:
+    """Token buckets in Redis, shared by every worker; refill uses the Redis clock."""
+
+    SCRIPT = """
+    local rate, capacity, cost, floor = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3]), tonumber(ARGV[4])
+    local t = redis.call('TIME')
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local tokens = tonumber(state[1]) or capacity
+    local updated = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + (now - updated) * rate)
+    local wait = 0
+    if cost > 0 and tokens - cost < floor then
+        wait = (cost + floor - tokens) / rate
+    else
+        tokens = math.min(capacity, tokens - cost)
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+    return tostring(wait)
+    """
+
+    def __init__(self, url):
+        import redis.asyncio as redis
+        self._redis = redis.from_url(url)
+        self._script = self._redis.register_script(self.SCRIPT)
+
+    async def take(self, key, rate, capacity, cost=1.0, floor=0.0):
+        return float(await self._script(keys=[f"ratelimit:{key}"], args=[rate, capacity, cost, floor]))
+
+
+def make_backend():
+    if RATE_LIMIT_REDIS_URL:
+        return RedisBackend(RATE_LIMIT_REDIS_URL)
+    return MemoryBackend()
+
+
+def parse_overrides(spec):
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        path, _, rate = item.partition("=")
+        overrides[path.strip()] = float(rate)
+    return overrides
+
+
+class UserRateLimiter:
+    """Per-user, per-endpoint request rate."""
+
+    def __init__(self, backend, per_minute=RATE_LIMIT_USER_PER_MINUTE, burst=RATE_LIMIT_USER_BURST,
+                 overrides=RATE_LIMIT_OVERRIDES):
+        self.backend = backend
+        self.per_minute = per_minute
+        self.burst = burst
+        self.overrides = parse_overrides(overrides)
+        self.stats = {"allowed": 0, "limited": 0}
+
+    async def check(self, user_id, endpoint):
+        per_minute = self.overrides.get(endpoint, self.per_minute)
+        if per_minute <= 0:
+            return
+        wait = await self.backend.take(f"user:{user_id}:{endpoint}", per_minute / 60, self.burst)
+        if wait:
+            self.stats["limited"] += 1
+            raise RateLimited(wait)
+        self.stats["allowed"] += 1
+
+
+def estimate_tokens(op, args):
+    """Rough provider tokens for a call: ~4 characters per token, output about as long as input."""
+    if "transcribe" in op:
+        return 1000
+    total = 0
+    for arg in args:
+        if isinstance(arg, str):
+            total += len(arg) // 4 + 1
+        elif isinstance(arg, (list, tuple)):
+            total += sum(len(item) // 4 + 1 if isinstance(item, str) else 500 for item in arg)
+    return total * 2
+
+
+class ProviderBudget:
+    """Global requests-per-minute and tokens-per-minute budget for provider calls.
+
+    Calls that would exceed it queue until the buckets refill, for at most
+    PROVIDER_QUEUE_MAX_WAIT_MS, and are then refused with RateLimited. While
+    any interactive call is queued, bulk calls wait behind it. Bulk calls
+    also leave PROVIDER_INTERACTIVE_RESERVE of each bucket untouched, so
+    interactive traffic keeps flowing near the quota.
+    """
+
+    POLL_SECONDS = 0.05
+
+    def __init__(self, backend, rpm=PROVIDER_RPM, tpm=PROVIDER_TPM, reserve=PROVIDER_INTERACTIVE_RESERVE,
+                 max_wait_ms=PROVIDER_QUEUE_MAX_WAIT_MS):
+        self.backend = backend
+        self.rpm = rpm
+        self.tpm = tpm
+        self.reserve = reserve
+        self.max_wait = max_wait_ms / 1000
+        self._waiting = {INTERACTIVE: 0, BULK: 0}
+        self.stats = {"admitted": 0, "queued": 0, "refused": 0}
+
+    @property
+    def enabled(self):
+        return self.rpm > 0 or self.tpm > 0
+
+    async def _try(self, tokens, priority):
+        share = self.reserve if priority != INTERACTIVE else 0.0
+        if self.tpm > 0:
+            wait = await self.backend.take("provider:tpm", self.tpm / 60, self.tpm, tokens, self.tpm * share)
+            if wait:
+                return wait
+        if self.rpm > 0:
+            wait = await self.backend.take("provider:rpm", self.rpm / 60, self.rpm, 1, self.rpm * share)
+            if wait:
+                if self.tpm > 0:
+                    await self.backend.take("provider:tpm", self.tpm / 60, self.tpm, -tokens)
+                return wait
+        return 0.0
+
+    async def admit(self, op, args):
+        if not self.enabled:
+            return
+        priority = request_priority.get()
+        share = self.reserve if priority != INTERACTIVE else 0.0
+        # A call larger than the whole bucket is charged the whole bucket
+        tokens = min(estimate_tokens(op, args), self.tpm * (1 - share)) if self.tpm > 0 else 0
+        deadline = time.monotonic() + self.max_wait
+        queued = False
+        self._waiting[priority] += 1
+        try:
+            while True:
+                if priority == INTERACTIVE or not self._waiting[INTERACTIVE]:
+                    wait = await self._try(tokens, priority)
+                    if not wait:
+                        self.stats["admitted"] += 1
+                        return
+                else:
+                    wait = self.POLL_SECONDS
+                if time.monotonic() + wait > deadline:
+                    self.stats["refused"] += 1
+                    raise RateLimited(wait, "Provider quota exhausted, try again later")
+                if not queued:
+                    queued = True
+                    self.stats["queued"] += 1
+                await asyncio.sleep(min(wait, self.POLL_SECONDS * 4))
+        finally:
+            self._waiting[priority] -= 1
+
+    def snapshot(self):
+        return {**self.stats, "rpm": self.rpm, "tpm": self.tpm,
+                "waiting_interactive": self._waiting[INTERACTIVE], "waiting_bulk": self._waiting[BULK]}
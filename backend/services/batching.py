@@ -0,0 +1,57 @@
+import json
+import os
+
+# Packing budget for one batched provider call. Characters are a cheap proxy
+# for tokens; the output is roughly as long as the input, so this also keeps
+# replies well inside the model's output limit.
+BATCH_MAX_CHARS = int(os.getenv("BATCH_MAX_CHARS", 8000))
+BATCH_MAX_SEGMENTS = int(os.getenv("BATCH_MAX_SEGMENTS", 100))
+
+
+def batch_payload(texts):
+    """Serialize segments as a JSON array of {id, text}.
+
+    JSON framing means quotes, newlines or delimiter-looking text inside a
+    segment can never be confused with the boundaries between segments.
+    """
+    return json.dumps([{"id": i, "text": t} for i, t in enumerate(texts)], ensure_ascii=False)
+
+
+def parse_batch_response(raw: str, count: int):
+    """Map a structured batch reply back to input order. Returns None if anything is missing or blank."""
+    try:
+        items = json.loads(raw)
+        if isinstance(items, dict):
+            items = items.get("translations")
+        translations = [None] * count
+        for item in items:
+            index = int(item["id"])
+            translation = item["translation"]
+            # null, numbers or "" would otherwise be cached and served as translations
+            if not isinstance(translation, str) or not translation.strip():
+                return None
+            if 0 <= index < count:
+                translations[index] = translation.strip()
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+    if any(t is None for t in translations):
+        return None
+    return translations
+
+
+def pack_segments(texts, max_chars=BATCH_MAX_CHARS, max_segments=BATCH_MAX_SEGMENTS):
+    """Greedily split `texts` into consecutive chunks that fit one provider call.
+
+    Returns lists of indexes into `texts`. An oversized segment gets a chunk
+    of its own rather than being split.
+    """
+    chunks, current, size = [], [], 0
+    for index, text in enumerate(texts):
+        if current and (size + len(text) > max_chars or len(current) >= max_segments):
+            chunks.append(current)
+            current, size = [], 0
+        current.append(index)
+        size += len(text)
+    if current:
+        chunks.append(current)
+    return chunks
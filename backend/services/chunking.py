@@ -0,0 +1,116 @@
+import os
+import re
+import zlib
+
+# Characters per provider call for document translation; the reply is about
+# as long as the input, so this also bounds output tokens.
+DOCUMENT_CHUNK_CHARS = int(os.getenv("DOCUMENT_CHUNK_CHARS", 4000))
+# On average one paragraph in this many ends a chunk early (see split_document)
+DOCUMENT_BOUNDARY_EVERY = int(os.getenv("DOCUMENT_BOUNDARY_EVERY", 4))
+# Chunks of one document translated at once (provider_slots still caps the worker)
+DOCUMENT_MAX_CONCURRENCY = int(os.getenv("DOCUMENT_MAX_CONCURRENCY", 8))
+DOCUMENT_MAX_CHARS = int(os.getenv("DOCUMENT_MAX_CHARS", 500000))
+
+PARAGRAPH_BREAK = re.compile(r"(\n[ \t]*\n\s*)")
+# Sentence end: Latin/Devanagari/CJK terminators, optional closing quote or bracket, then whitespace
+SENTENCE_END = re.compile(r"[.!?।॥。！？][\"'”’)\]]*(\s+)")
+
+
+def _split_keep(pattern, text):
+    """Split text on pattern into (piece, separator) pairs; the last separator is ''."""
+    parts = pattern.split(text)
+    return [(parts[i], parts[i + 1] if i + 1 < len(parts) else "") for i in range(0, len(parts), 2)]
+
+
+def _sentences(text):
+    """Split text into (sentence, following whitespace) pairs."""
+    pairs, pos = [], 0
+    for match in SENTENCE_END.finditer(text):
+        pairs.append((text[pos:match.start(1)], match.group(1)))
+        pos = match.end()
+    pairs.append((text[pos:], ""))
+    return pairs
+
+
+def _split_long(text, max_chars):
+    """Split a sentence with no usable boundary at the last whitespace before max_chars."""
+    pieces = []
+    while len(text) > max_chars:
+        cut = text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            pieces.append((text[:max_chars], ""))
+            text = text[max_chars:]
+        else:
+            pieces.append((text[:cut], " "))
+            text = text[cut + 1:]
+    pieces.append((text, ""))
+    return pieces
+
+
+def _units(paragraph, max_chars):
+    """A paragraph as one unit, or as sentence-sized units if it is too long for one call."""
+    if len(paragraph) <= max_chars:
+        return [(paragraph, "")]
+    units = []
+    for sentence, space in _sentences(paragraph):
+        if len(sentence) > max_chars:
+            pieces = _split_long(sentence, max_chars)
+            pieces[-1] = (pieces[-1][0], space)
+            units.extend(pieces)
+        else:
+            units.append((sentence, space))
+    return units
+
+
+def split_document(text, max_chars=DOCUMENT_CHUNK_CHARS, boundary_every=DOCUMENT_BOUNDARY_EVERY):
+    """Split a document into chunks that each fit one provider call.
+
+    Returns (leading whitespace, [(chunk, separator), ...]) such that
+    leading + ''.join(chunk + separator) == text. Whitespace between chunks
+    is kept out of the chunks so it survives translation verbatim.
+
+    Paragraphs (or sentences of overlong paragraphs) are packed greedily,
+    but a chunk also ends after any paragraph whose checksum is divisible by
+    `boundary_every`. Boundaries then depend on content rather than
+    position, so editing one paragraph changes only the chunk containing it
+    and unchanged chunks hit the translation cache.
+    """
+    stripped = text.lstrip()
+    leading = text[:len(text) - len(stripped)]
+    units = []
+    for paragraph, separator in _split_keep(PARAGRAPH_BREAK, stripped):
+        paragraph_units = _units(paragraph, max_chars)
+        last_text, last_space = paragraph_units[-1]
+        paragraph_units[-1] = (last_text, last_space + separator)
+        ends_chunk = zlib.crc32(paragraph.encode()) % boundary_every == 0
+        units.extend((unit, space, ends_chunk and i == len(paragraph_units) - 1)
+                     for i, (unit, space) in enumerate(paragraph_units))
+
+    chunks, current, size = [], [], 0
+
+    def close():
+        body = "".join(unit + space for unit, space in current)
+        trimmed = body.rstrip()
+        chunks.append((trimmed, body[len(trimmed):]))
+
+    for unit, space, boundary in units:
+        if current and size + len(unit) > max_chars:
+            close()
+            current, size = [], 0
+        current.append((unit, space))
+        size += len(unit) + len(space)
+        if boundary:
+            close()
+            current, size = [], 0
+    if current:
+        close()
+    # Whitespace-only pieces need no translation; fold them into the previous separator
+    merged = []
+    for chunk, separator in chunks:
+        if not chunk and merged:
+            merged[-1] = (merged[-1][0], merged[-1][1] + separator)
+        elif chunk:
+            merged.append((chunk, separator))
+        else:
+            leading += separator
+    return leading, merged
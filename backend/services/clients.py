@@ -0,0 +1,71 @@
+import json
+import os
+import threading
+
+# Connection pool shared by every request a provider client makes
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("PROVIDER_MAX_CONNECTIONS", 1000))
+PROVIDER_MAX_KEEPALIVE = int(os.getenv("PROVIDER_MAX_KEEPALIVE", 100))
+# httpx drops idle connections after 5s by default, so traffic gaps cost a new TLS handshake
+PROVIDER_KEEPALIVE_SECONDS = float(os.getenv("PROVIDER_KEEPALIVE_SECONDS", 60))
+# Open provider connections at startup so the first requests skip the TLS handshake
+PROVIDER_WARMUP = os.getenv("PROVIDER_WARMUP", "false").lower() in ("1", "true", "yes")
+
+
+def http_limits():
+    import httpx
+    return httpx.Limits(
+        max_connections=PROVIDER_MAX_CONNECTIONS,
+        max_keepalive_connections=PROVIDER_MAX_KEEPALIVE,
+        keepalive_expiry=PROVIDER_KEEPALIVE_SECONDS,
+    )
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        try:
+            return tuple(sorted(value.items()))
+        except TypeError:
+            return json.dumps(value, sort_keys=True, default=str)
+    return value
+
+
+class ClientRegistry:
+    """Process-wide cache of provider SDK objects.
+
+    Each SDK model or client is built once per distinct configuration and
+    shared by every request, so request handlers never parse generation
+    configs or open connection pools of their own.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+        self.stats = {"created": 0, "reused": 0}
+
+    def get(self, factory, *config):
+        """Return factory(*config), building it on first use. Config may hold dicts."""
+        key = (factory, *map(_freeze, config))
+        try:
+            item = self._items.get(key)
+        except TypeError:
+            key = (factory, *(json.dumps(part, sort_keys=True, default=str) for part in config))
+            item = self._items.get(key)
+        if item is None:
+            with self._lock:
+                item = self._items.get(key)
+                if item is None:
+                    item = self._items[key] = factory(*config)
+                    self.stats["created"] += 1
+                    return item
+        self.stats["reused"] += 1
+        return item
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def snapshot(self):
+        return {**self.stats, "entries": len(self._items)}
+
+
+registry = ClientRegistry()
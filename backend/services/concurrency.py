@@ -0,0 +1,58 @@
+import asyncio
+import os
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+# Dedicated pool for SDK calls that have no async API (file uploads, gTTS),
+# so they never compete with FastAPI's own threadpool.
+BLOCKING_IO_WORKERS = int(os.getenv("PROVIDER_BLOCKING_WORKERS", 32))
+
+_blocking_pool = ThreadPoolExecutor(max_workers=BLOCKING_IO_WORKERS, thread_name_prefix="provider-io")
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking provider call on the dedicated pool without stalling the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_blocking_pool, partial(func, *args, **kwargs))
+
+
+_exhausted = object()
+
+
+async def iterate_blocking(iterator):
+    """Drive a blocking iterator (e.g. gTTS.stream()) on the dedicated pool, yielding items as they arrive."""
+    while True:
+        item = await run_blocking(next, iterator, _exhausted)
+        if item is _exhausted:
+            return
+        yield item
+
+
+class Limiter:
+    """Caps in-flight upstream calls: `async with limiter: ...`.
+
+    Semaphores are created lazily per event loop so the limiter can live at
+    module level and still work under test clients that spin up new loops.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.in_flight = 0
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _semaphore(self):
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.limit)
+        return semaphore
+
+    async def __aenter__(self):
+        await self._semaphore().acquire()
+        self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.in_flight -= 1
+        self._semaphore().release()
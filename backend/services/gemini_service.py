@@ -1,121 +1,137 @@
-import google.generativeai as genai
 import os
 from dotenv import load_dotenv
-from gtts import gTTS
 import io
-import PIL.Image
 import base64
+import json
+import logging
+from services.concurrency import Limiter, run_blocking, iterate_blocking
+from services.batching import parse_batch_response
+from services import clients, metrics, prompts
+from services.remote_files import RemoteFileCache
+from services.prompts import ROMANIZED_MAP, LANG_CODES, tts_language_code, resolve_target_language
 
 import pathlib
 env_path = pathlib.Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
 api_key = os.getenv("GEMINI_API_KEY")
-if api_key:
-    genai.configure(api_key=api_key)
+
+PROVIDER = "gemini"
+MODEL_NAME = 'gemini-2.5-flash'
+TTS_VOICE = "gtts"
+JSON_CONFIG = {"response_mime_type": "application/json"}
+
+logger = logging.getLogger(__name__)
+
+# Max concurrent upstream Gemini calls per worker
+provider_slots = Limiter(int(os.getenv("GEMINI_MAX_CONCURRENCY", 128)))
+
+def is_configured():
+    return bool(api_key)
+
+_genai = None
+
+def sdk():
+    """The google.generativeai module, imported and configured on first use.
+
+    Importing it takes most of a second, so cold starts that never call
+    Gemini (e.g. with AI_PROVIDER=openai) skip it entirely.
+    """
+    global _genai
+    if _genai is None:
+        import google.generativeai as genai
+        if api_key:
+            genai.configure(api_key=api_key)
+        _genai = genai
+    return _genai
+
+def _upload_file(path):
+    return sdk().upload_file(path=path)
+
+def _delete_file(remote_file):
+    sdk().delete_file(remote_file.name)
+
+# Audio uploaded for transcription: reused by content hash, deleted once stale
+uploaded_files = RemoteFileCache(_upload_file, _delete_file)
+
+def _record_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        metrics.count_tokens(PROVIDER, usage.prompt_token_count, usage.candidates_token_count)
+
+def _build_model(model_name, generation_config, system_instruction):
+    return sdk().GenerativeModel(model_name, generation_config=generation_config, system_instruction=system_instruction)
+
+def get_model(generation_config=None, system_instruction=None):
+    """Shared GenerativeModel for this configuration; built on first use."""
+    return clients.registry.get(_build_model, MODEL_NAME, generation_config, system_instruction)
+
+async def warm_up():
+    get_model()
+    get_model(JSON_CONFIG)
+    if clients.PROVIDER_WARMUP and is_configured():
+        try:
+            # Free call that opens the async channel
+            await get_model().count_tokens_async("warm up")
+        except Exception as e:
+            logger.warning("Gemini warm-up failed: %s", e)
 
 def translate_text(text: str, target_language: str):
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        
-        # Handle romanized versions
-        romanized_map = {
-            'hinglish': 'Hindi',
-            'romanized marathi': 'Marathi',
-            'romanized bengali': 'Bengali',
-            'romanized tamil': 'Tamil',
-            'romanized telugu': 'Telugu',
-            'romanized gujarati': 'Gujarati',
-            'romanized kannada': 'Kannada',
-            'romanized malayalam': 'Malayalam',
-            'romanized punjabi': 'Punjabi',
-            'romanized urdu': 'Urdu',
-            'romanized odia': 'Odia',
-            'romanized assamese': 'Assamese',
-            'romanized japanese': 'Japanese'
-        }
-        
-        target_lower = target_language.lower()
-        if target_lower in romanized_map:
-            base_lang = romanized_map[target_lower]
-            prompt = f"Translate the following text to {base_lang} but write it using English letters (romanized {base_lang}). Return only the translated text.\n\nText: {text}"
-        else:
-            prompt = f"Translate the following text to {target_language}. Return only the translated text.\n\nText: {text}"
-        
+        model = get_model()
+        prompt = prompts.translation_prompt(text, target_language)
         response = model.generate_content(prompt)
         return response.text.strip()
     except Exception as e:
-        print(f"Error translating text: {e}")
+        logger.warning("Error translating text: %s", e)
         return None
 
 def transcribe_audio(audio_file_path: str):
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = get_model()
         # Upload the file to Gemini
-        audio_file = genai.upload_file(path=audio_file_path)
-        
-        # Generate content using the audio file
-        response = model.generate_content([
-            "Transcribe the following audio file exactly as spoken.",
-            audio_file
-        ])
-        
-        # Clean up the file from Gemini storage (optional but good practice)
-        # audio_file.delete() # Not strictly necessary for free tier immediately, but good practice. 
-        # However, the python SDK might not have delete() on the file object directly in all versions, 
-        # usually it's genai.delete_file(audio_file.name).
+        audio_file = sdk().upload_file(path=audio_file_path)
+        try:
+            # Generate content using the audio file
+            response = model.generate_content([
+                prompts.TRANSCRIBE_PROMPT,
+                audio_file
+            ])
+        finally:
+            # Clean up the file from Gemini storage
+            _delete_file(audio_file)
         
         return response.text.strip()
     except Exception as e:
-        print(f"Error transcribing audio: {e}")
+        logger.warning("Error transcribing audio: %s", e)
         return None
 
 def analyze_image(image_data: str):
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
+        model = get_model()
         
         # Decode base64 image
         image_bytes = base64.b64decode(image_data)
+        import PIL.Image
         image = PIL.Image.open(io.BytesIO(image_bytes))
         
         response = model.generate_content([
-            "Extract all text from this image and translate it to English. If there is no text, describe the image.",
+            prompts.image_prompt("English"),
             image
         ])
         return response.text.strip()
     except Exception as e:
-        print(f"Error analyzing image: {e}")
+        logger.warning("Error analyzing image: %s", e)
         return None
 
 def text_to_speech(text: str, language: str = 'en'):
     try:
-        # Map full language names to codes
-        lang_map = {
-            'Hindi': 'hi',
-            'Spanish': 'es',
-            'French': 'fr',
-            'German': 'de',
-            'Japanese': 'ja',
-            'Tamil': 'ta',
-            'Telugu': 'te',
-            'English': 'en',
-            'Marathi': 'mr',
-            'Bengali': 'bn',
-            'Gujarati': 'gu',
-            'Kannada': 'kn',
-            'Malayalam': 'ml',
-            'Punjabi': 'pa',
-            'Urdu': 'ur',
-            'Odia': 'or',
-            'Assamese': 'as'
-        }
-        
-        # Default to 'en' if not found, or use the code if it's already a code
-        lang_code = lang_map.get(language, language if len(language) == 2 else 'en')
+        lang_code = tts_language_code(language)
         
-        print(f"DEBUG TTS: Generating speech for language: {language} -> {lang_code}")
+        logger.debug("tts synthesis language=%s lang_code=%s chars=%d", language, lang_code, len(text))
         
         # gTTS generates speech
+        from gtts import gTTS
         tts = gTTS(text=text, lang=lang_code)
         
         fp = io.BytesIO()
@@ -123,8 +139,95 @@ def text_to_speech(text: str, language: str = 'en'):
         fp.seek(0)
         audio_data = fp.read()
         
-        print(f"DEBUG TTS: Generated {len(audio_data)} bytes of audio")
+        logger.debug("tts synthesized bytes=%d", len(audio_data))
         return audio_data
     except Exception as e:
-        print(f"Error generating speech: {e}")
+        logger.warning("Error generating speech: %s", e)
         return None
+
+
+# Async variants: native SDK coroutines where available, the dedicated
+# blocking pool otherwise, all bounded by provider_slots.
+
+async def generate_text_async(contents):
+    """Run a single generate_content call and return the stripped text. Raises on failure."""
+    async with provider_slots:
+        response = await get_model().generate_content_async(contents)
+    _record_usage(response)
+    return response.text.strip()
+
+async def translate_text_async(text: str, target_language: str, reference=None):
+    try:
+        return await generate_text_async(prompts.translation_prompt(text, target_language, reference))
+    except Exception as e:
+        logger.warning("Error translating text: %s", e)
+        return None
+
+async def translate_batch_async(texts, target_language: str):
+    """Translate many segments in one call. Returns None if the reply cannot be split reliably."""
+    try:
+        async with provider_slots:
+            response = await get_model(JSON_CONFIG).generate_content_async(prompts.batch_prompt(texts, target_language))
+        _record_usage(response)
+        return parse_batch_response(response.text, len(texts))
+    except Exception as e:
+        logger.warning("Error translating batch: %s", e)
+        return None
+
+async def translate_text_stream(text: str, target_language: str):
+    """Yield translated text fragments as Gemini produces them. Raises on failure."""
+    async with provider_slots:
+        response = await get_model().generate_content_async(prompts.translation_prompt(text, target_language), stream=True)
+        async for chunk in response:
+            if chunk.text:
+                yield chunk.text
+        _record_usage(response)
+
+async def transcribe_audio_async(audio_file_path: str):
+    audio_file = None
+    try:
+        async with provider_slots:
+            audio_file = await uploaded_files.acquire(audio_file_path)
+        return await generate_text_async([prompts.TRANSCRIBE_PROMPT, audio_file])
+    except Exception as e:
+        logger.warning("Error transcribing audio: %s", e)
+        return None
+    finally:
+        if audio_file is not None:
+            uploaded_files.release(audio_file)
+
+async def transcribe_and_translate_async(audio_file_path: str, target_language: str):
+    """Transcribe and translate in one call. Returns {"transcript", "translation"}, or None if the reply is unusable."""
+    audio_file = None
+    try:
+        async with provider_slots:
+            audio_file = await uploaded_files.acquire(audio_file_path)
+            response = await get_model(JSON_CONFIG).generate_content_async(
+                [prompts.voice_translation_prompt(target_language), audio_file]
+            )
+        _record_usage(response)
+        result = json.loads(response.text)
+        transcript, translation = result["transcript"], result["translation"]
+        if not isinstance(transcript, str) or not isinstance(translation, str):
+            return None
+        if not transcript.strip() or not translation.strip():
+            return None
+        return {"transcript": transcript.strip(), "translation": translation.strip()}
+    except Exception as e:
+        logger.warning("Error transcribing and translating audio: %s", e)
+        return None
+    finally:
+        if audio_file is not None:
+            uploaded_files.release(audio_file)
+
+async def text_to_speech_async(text: str, language: str = 'en'):
+    async with provider_slots:
+        return await run_blocking(text_to_speech, text, language)
+
+async def text_to_speech_stream(text: str, language: str = 'en'):
+    """Yield MP3 bytes per gTTS segment as each one is synthesized. Raises on failure."""
+    from gtts import gTTS
+    tts = gTTS(text=text, lang=tts_language_code(language))
+    async with provider_slots:
+        async for chunk in iterate_blocking(tts.stream()):
+            yield chunk
@@ -0,0 +1,312 @@
+import bisect
+import contextvars
+import logging
+import math
+import threading
+import time
+
+from starlette.datastructures import MutableHeaders
+
+# Prometheus text exposition, kept dependency-free: counters, gauges and
+# histograms with labels, plus collectors that turn existing `stats` dicts
+# into samples when /metrics is scraped.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+logger = logging.getLogger(__name__)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs += [f'{name}="{_escape(value)}"' for name, value in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector):
+        """`collector()` yields (name, kind, help, [(labels dict, value), ...]) when scraped."""
+        self._collectors.append(collector)
+        return collector
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception:
+                logger.exception("metrics collector failed")
+                continue
+            for name, kind, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_labels(labels.keys(), labels.values())} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class _Value:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self, lock):
+        self._lock = lock
+        self.value = 0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    __slots__ = ("_lock", "_bounds", "counts", "sum", "count")
+
+    def __init__(self, lock, bounds):
+        self._lock = lock
+        self._bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self._bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=(), registry=registry):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def labels(self, *values):
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value(self._lock)
+
+    def inc(self, amount=1):
+        self.labels().inc(amount)
+
+    def render(self):
+        lines = self._header()
+        for key, child in list(self._children.items()):
+            lines.append(f"{self.name}{_labels(self.labelnames, key)} {_number(child.value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount=1):
+        self.labels().dec(amount)
+
+    def set(self, value):
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=registry):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def _new_child(self):
+        return _HistogramValue(self._lock, self.buckets)
+
+    def observe(self, value):
+        self.labels().observe(value)
+
+    def render(self):
+        lines = self._header()
+        for key, child in list(self._children.items()):
+            with self._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = _labels(self.labelnames, key, [("le", _number(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+http_request_seconds = Histogram(
+    "linguaflow_http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status")
+)
+http_in_flight = Gauge("linguaflow_http_requests_in_flight", "HTTP requests being handled")
+websockets_open = Gauge("linguaflow_websocket_connections", "Open WebSocket connections", ("route",))
+stage_seconds = Histogram("linguaflow_stage_duration_seconds", "Time spent in each request stage", ("stage",))
+provider_call_seconds = Histogram(
+    "linguaflow_provider_call_duration_seconds", "Provider call latency", ("provider", "operation", "outcome")
+)
+memory_match_score = Histogram(
+    "linguaflow_fuzzy_memory_match_score", "Similarity of fuzzy translation memory matches", ("use",),
+    buckets=(0.6, 0.7, 0.8, 0.85, 0.9, 0.95, 0.98, 0.99, 1.0),
+)
+provider_tokens = Counter("linguaflow_provider_tokens_total", "Tokens reported by providers", ("provider", "kind"))
+
+# Stages timed while handling the current request, for the Server-Timing header
+_timings = contextvars.ContextVar("server_timings", default=None)
+
+
+def record_stage(name, seconds):
+    stage_seconds.labels(name).observe(seconds)
+    timings = _timings.get()
+    if timings is not None:
+        timings.append((name, seconds))
+
+
+class stage:
+    """Time a block as a named request stage: `with metrics.stage("jwt_decode"): ...`."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record_stage(self.name, time.perf_counter() - self.start)
+
+
+def record_provider_call(provider, op, ok, seconds):
+    provider_call_seconds.labels(provider, op, "ok" if ok else "error").observe(seconds)
+    record_stage("provider", seconds)
+
+
+def count_tokens(provider, prompt_tokens, completion_tokens):
+    if prompt_tokens:
+        provider_tokens.labels(provider, "prompt").inc(prompt_tokens)
+    if completion_tokens:
+        provider_tokens.labels(provider, "completion").inc(completion_tokens)
+
+
+def server_timing(timings, total):
+    """Server-Timing header value; repeated stages (e.g. parallel provider calls) are summed."""
+    merged = {}
+    for name, seconds in timings:
+        count, elapsed = merged.get(name, (0, 0.0))
+        merged[name] = (count + 1, elapsed + seconds)
+    parts = []
+    for name, (count, elapsed) in merged.items():
+        desc = f';desc="{count} calls"' if count > 1 else ""
+        parts.append(f"{name}{desc};dur={elapsed * 1000:.1f}")
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class TimingMiddleware:
+    """Records per-route request latency and adds a Server-Timing header with the stages of each request.
+
+    Plain ASGI rather than BaseHTTPMiddleware, so streaming responses pass
+    straight through; stages finishing after the headers are sent (e.g.
+    while a stream is relayed) only reach the histograms.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            await self._websocket(scope, receive, send)
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", server_timing(timings, time.perf_counter() - start))
+            await send(message)
+
+        http_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            http_in_flight.dec()
+            _timings.reset(token)
+            route = scope.get("route")
+            # Route templates, not raw paths, keep the label set bounded
+            path = getattr(route, "path", None) or "unmatched"
+            http_request_seconds.labels(scope["method"], path, status_code).observe(time.perf_counter() - start)
+
+    async def _websocket(self, scope, receive, send):
+        gauge = None
+
+        async def send_tracking(message):
+            nonlocal gauge
+            if message["type"] == "websocket.accept":
+                gauge = websockets_open.labels(getattr(scope.get("route"), "path", scope["path"]))
+                gauge.inc()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_tracking)
+        finally:
+            if gauge is not None:
+                gauge.dec()
@@ -1,35 +1,89 @@
-from openai import OpenAI
 import os
 from dotenv import load_dotenv
 import base64
+import logging
+from services.concurrency import Limiter, run_blocking
+from services.batching import batch_payload, parse_batch_response
+from services import clients, metrics, prompts
 
 import pathlib
 env_path = pathlib.Path(__file__).parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
 api_key = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key) if api_key else None
+
+def _build_client(key):
+    from openai import OpenAI, DefaultHttpxClient
+    return OpenAI(api_key=key, http_client=DefaultHttpxClient(limits=clients.http_limits()))
+
+def _build_async_client(key):
+    from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+    return AsyncOpenAI(api_key=key, http_client=DefaultAsyncHttpxClient(limits=clients.http_limits()))
+
+# One client per process, each with a keep-alive pool sized for concurrent calls. They are
+# built, and the openai package imported, on first use; None without an API key.
+def get_client():
+    return clients.registry.get(_build_client, api_key) if api_key else None
+
+def get_async_client():
+    return clients.registry.get(_build_async_client, api_key) if api_key else None
+
+PROVIDER = "openai"
+MODEL_NAME = "gpt-4o"
+TTS_MODEL = "tts-1"
+TTS_VOICE = "alloy"
+
+logger = logging.getLogger(__name__)
+
+# Max concurrent upstream OpenAI calls per worker
+provider_slots = Limiter(int(os.getenv("OPENAI_MAX_CONCURRENCY", 128)))
+
+def _record_usage(usage):
+    if usage:
+        metrics.count_tokens(PROVIDER, usage.prompt_tokens, usage.completion_tokens)
+
+def is_configured():
+    return bool(api_key)
+
+async def warm_up():
+    async_client = get_async_client()
+    if clients.PROVIDER_WARMUP and async_client:
+        try:
+            # Cheap authenticated call that leaves a pooled connection open
+            await async_client.models.retrieve(MODEL_NAME)
+        except Exception as e:
+            logger.warning("OpenAI warm-up failed: %s", e)
+
+def resolve_target_language(target_language: str):
+    """Canonical form of a target language used for cache keys."""
+    return target_language.strip().lower()
+
+def tts_language_code(language: str):
+    # OpenAI voices detect the language from the input text
+    return "auto"
 
 def translate_text(text: str, target_language: str):
+    client = get_client()
     if not client:
-        print("OpenAI API key not found.")
+        logger.warning("OpenAI API key not found.")
         return None
     try:
         response = client.chat.completions.create(
-            model="gpt-4o",
+            model=MODEL_NAME,
             messages=[
-                {"role": "system", "content": f"You are a helpful translator. Translate the following text to {target_language}. Return only the translated text."},
+                {"role": "system", "content": prompts.openai_translate_system(target_language)},
                 {"role": "user", "content": text}
             ]
         )
         return response.choices[0].message.content
     except Exception as e:
-        print(f"Error translating text: {e}")
+        logger.warning("Error translating text: %s", e)
         return None
 
 def transcribe_audio(audio_file_path):
+    client = get_client()
     if not client:
-        print("OpenAI API key not found.")
+        logger.warning("OpenAI API key not found.")
         return None
     try:
         with open(audio_file_path, "rb") as audio_file:
@@ -39,21 +93,22 @@ def transcribe_audio(audio_file_path):
             )
         return transcript.text
     except Exception as e:
-        print(f"Error transcribing audio: {e}")
+        logger.warning("Error transcribing audio: %s", e)
         return None
 
 def analyze_image(image_data: str):
+    client = get_client()
     if not client:
-        print("OpenAI API key not found.")
+        logger.warning("OpenAI API key not found.")
         return None
     try:
         response = client.chat.completions.create(
-            model="gpt-4o",
+            model=MODEL_NAME,
             messages=[
                 {
                     "role": "user",
                     "content": [
-                        {"type": "text", "text": "Extract all text from this image and translate it to English. If there is no text, describe the image."},
+                        {"type": "text", "text": prompts.image_prompt("English")},
                         {
                             "type": "image_url",
                             "image_url": {
@@ -66,20 +121,141 @@ def analyze_image(image_data: str):
         )
         return response.choices[0].message.content
     except Exception as e:
-        print(f"Error analyzing image: {e}")
+        logger.warning("Error analyzing image: %s", e)
         return None
 
 def text_to_speech(text: str, language: str = 'en'):
+    client = get_client()
     if not client:
-        print("OpenAI API key not found.")
+        logger.warning("OpenAI API key not found.")
         return None
     try:
         response = client.audio.speech.create(
-            model="tts-1",
-            voice="alloy",
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
             input=text
         )
         return response.content
     except Exception as e:
-        print(f"Error generating speech: {e}")
+        logger.warning("Error generating speech: %s", e)
+        return None
+
+
+# Async variants backed by AsyncOpenAI, bounded by provider_slots.
+
+async def translate_text_async(text: str, target_language: str, reference=None):
+    async_client = get_async_client()
+    if not async_client:
+        logger.warning("OpenAI API key not found.")
+        return None
+    try:
+        async with provider_slots:
+            response = await async_client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": prompts.openai_translate_system(target_language, reference)},
+                    {"role": "user", "content": text}
+                ]
+            )
+        _record_usage(response.usage)
+        return response.choices[0].message.content
+    except Exception as e:
+        logger.warning("Error translating text: %s", e)
+        return None
+
+async def translate_text_stream(text: str, target_language: str):
+    """Yield translated text fragments as the completion streams in. Raises on failure."""
+    async_client = get_async_client()
+    if not async_client:
+        raise RuntimeError("OpenAI API key not found.")
+    async with provider_slots:
+        stream = await async_client.chat.completions.create(
+            model=MODEL_NAME,
+            stream=True,
+            # The final chunk then carries token usage and no choices
+            stream_options={"include_usage": True},
+            messages=[
+                {"role": "system", "content": prompts.openai_translate_system(target_language)},
+                {"role": "user", "content": text}
+            ]
+        )
+        async for chunk in stream:
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                yield delta
+            _record_usage(chunk.usage)
+
+async def translate_batch_async(texts, target_language: str):
+    """Translate many segments in one call. Returns None if the reply cannot be split reliably."""
+    async_client = get_async_client()
+    if not async_client:
+        logger.warning("OpenAI API key not found.")
+        return None
+    segments = batch_payload(texts)
+    try:
+        async with provider_slots:
+            response = await async_client.chat.completions.create(
+                model=MODEL_NAME,
+                response_format={"type": "json_object"},
+                messages=[
+                    {"role": "system", "content": prompts.openai_batch_system(target_language, len(texts))},
+                    {"role": "user", "content": segments}
+                ]
+            )
+        _record_usage(response.usage)
+        return parse_batch_response(response.choices[0].message.content, len(texts))
+    except Exception as e:
+        logger.warning("Error translating batch: %s", e)
+        return None
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+async def transcribe_audio_async(audio_file_path):
+    async_client = get_async_client()
+    if not async_client:
+        logger.warning("OpenAI API key not found.")
+        return None
+    try:
+        audio_bytes = await run_blocking(_read_file, audio_file_path)
+        async with provider_slots:
+            transcript = await async_client.audio.transcriptions.create(
+                model="whisper-1",
+                file=(os.path.basename(audio_file_path), audio_bytes)
+            )
+        return transcript.text
+    except Exception as e:
+        logger.warning("Error transcribing audio: %s", e)
+        return None
+
+async def text_to_speech_async(text: str, language: str = 'en'):
+    async_client = get_async_client()
+    if not async_client:
+        logger.warning("OpenAI API key not found.")
+        return None
+    try:
+        async with provider_slots:
+            response = await async_client.audio.speech.create(
+                model=TTS_MODEL,
+                voice=TTS_VOICE,
+                input=text
+            )
+        return response.content
+    except Exception as e:
+        logger.warning("Error generating speech: %s", e)
         return None
+
+async def text_to_speech_stream(text: str, language: str = 'en'):
+    """Yield MP3 bytes as the speech endpoint streams them. Raises on failure."""
+    async_client = get_async_client()
+    if not async_client:
+        raise RuntimeError("OpenAI API key not found.")
+    async with provider_slots:
+        async with async_client.audio.speech.with_streaming_response.create(
+            model=TTS_MODEL,
+            voice=TTS_VOICE,
+            input=text
+        ) as response:
+            async for chunk in response.iter_bytes(16384):
+                yield chunk
@@ -0,0 +1,134 @@
+"""Prompt templates and language tables shared by every endpoint and provider."""
+from services.batching import batch_payload
+
+# Handle romanized versions
+ROMANIZED_MAP = {
+    'hinglish': 'Hindi',
+    'romanized marathi': 'Marathi',
+    'romanized bengali': 'Bengali',
+    'romanized tamil': 'Tamil',
+    'romanized telugu': 'Telugu',
+    'romanized gujarati': 'Gujarati',
+    'romanized kannada': 'Kannada',
+    'romanized malayalam': 'Malayalam',
+    'romanized punjabi': 'Punjabi',
+    'romanized urdu': 'Urdu',
+    'romanized odia': 'Odia',
+    'romanized assamese': 'Assamese',
+    'romanized japanese': 'Japanese'
+}
+
+# Map full language names to gTTS codes
+LANG_CODES = {
+    'Hindi': 'hi',
+    'Spanish': 'es',
+    'French': 'fr',
+    'German': 'de',
+    'Japanese': 'ja',
+    'Tamil': 'ta',
+    'Telugu': 'te',
+    'English': 'en',
+    'Marathi': 'mr',
+    'Bengali': 'bn',
+    'Gujarati': 'gu',
+    'Kannada': 'kn',
+    'Malayalam': 'ml',
+    'Punjabi': 'pa',
+    'Urdu': 'ur',
+    'Odia': 'or',
+    'Assamese': 'as'
+}
+
+# Per-language instructions are computed once here rather than on every request
+ROMANIZED_INSTRUCTIONS = {
+    name: f"{base} but write it using English letters (romanized {base})" for name, base in ROMANIZED_MAP.items()
+}
+CANONICAL_ROMANIZED = {name: f"romanized {base.lower()}" for name, base in ROMANIZED_MAP.items()}
+IMAGE_ROMANIZED_PROMPTS = {
+    name: (
+        f"Extract all text from this image. If there is text, translate it to {base} but write it using English letters "
+        f"(romanized {base}). If there is no text, describe the image in romanized {base} (using English letters)."
+    )
+    for name, base in ROMANIZED_MAP.items()
+}
+TRANSCRIBE_PROMPT = "Transcribe the following audio file exactly as spoken."
+
+
+def target_instruction(target_language: str):
+    return ROMANIZED_INSTRUCTIONS.get(target_language.lower(), target_language)
+
+
+def resolve_target_language(target_language: str):
+    """Canonical form of a target language, e.g. 'Hinglish' -> 'romanized hindi'."""
+    target_lower = target_language.strip().lower()
+    return CANONICAL_ROMANIZED.get(target_lower, target_lower)
+
+
+def tts_language_code(language: str):
+    # Default to 'en' if not found, or use the code if it's already a code
+    return LANG_CODES.get(language, language if len(language) == 2 else 'en')
+
+
+def reference_note(reference):
+    """Prompt lines offering a (source, translation) pair from translation memory, or "" without one."""
+    if not reference:
+        return ""
+    source, translation = reference
+    return (
+        "A very similar text was translated before. Reuse its wording where it still applies.\n"
+        f"Similar text: {source}\nIts translation: {translation}\n\n"
+    )
+
+
+def translation_prompt(text: str, target_language: str, reference=None):
+    return (
+        f"Translate the following text to {target_instruction(target_language)}. Return only the translated text.\n\n"
+        f"{reference_note(reference)}Text: {text}"
+    )
+
+
+def batch_prompt(texts, target_language: str):
+    return (
+        f"Translate the \"text\" of every object in the JSON array below to {target_instruction(target_language)}. "
+        f"Return a JSON array of {len(texts)} objects of the form {{\"id\": <same id>, \"translation\": <translated text>}}, "
+        "one per input object. Return only the JSON.\n\n"
+        f"{batch_payload(texts)}"
+    )
+
+
+def voice_translation_prompt(target_language: str):
+    return (
+        "Transcribe this audio exactly as spoken, then translate the transcript to "
+        f"{target_instruction(target_language)}. "
+        "Return only a JSON object of the form {\"transcript\": <transcript>, \"translation\": <translation>}."
+    )
+
+
+def image_prompt(target_language: str):
+    prompt = IMAGE_ROMANIZED_PROMPTS.get(target_language.lower())
+    if prompt:
+        return prompt
+    return f"Extract all text from this image and translate it to {target_language}. If there is no text, describe the image in {target_language}."
+
+
+def detect_language_prompt(text: str):
+    return f"Detect the language of this text and return ONLY the language name (e.g., 'Hindi', 'English', 'Spanish'). Text: {text}"
+
+
+def pronunciation_prompt(text: str, target_language: str):
+    return f"Provide a romanized pronunciation guide for this {target_language} text. Show how to pronounce it using English letters. Text: {text}"
+
+
+def openai_translate_system(target_language: str, reference=None):
+    system = f"You are a helpful translator. Translate the following text to {target_language}. Return only the translated text."
+    if reference:
+        system += "\n\n" + reference_note(reference).strip()
+    return system
+
+
+def openai_batch_system(target_language: str, count: int):
+    return (
+        f"You are a helpful translator. Translate the \"text\" of every object in the user's JSON array to {target_language}. "
+        f"Reply with a JSON object {{\"translations\": [{{\"id\": <same id>, \"translation\": <translated text>}}, ...]}} "
+        f"containing exactly {count} items."
+    )
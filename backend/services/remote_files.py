@@ -0,0 +1,145 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from collections import OrderedDict
+
+from services.concurrency import run_blocking
+
+# Uploaded provider files are reused for this long, then deleted remotely
+REMOTE_FILE_TTL_SECONDS = int(os.getenv("REMOTE_FILE_TTL_SECONDS", 600))
+REMOTE_FILE_MAX_ENTRIES = int(os.getenv("REMOTE_FILE_MAX_ENTRIES", 256))
+
+logger = logging.getLogger(__name__)
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("remote", "uploaded_at", "users", "retired")
+
+    def __init__(self, remote):
+        self.remote = remote
+        self.uploaded_at = time.monotonic()
+        self.users = 0
+        self.retired = False
+
+
+class RemoteFileCache:
+    """Tracks files uploaded to a provider so identical content is uploaded once and always cleaned up.
+
+    Files are keyed on a SHA-256 of their content. An entry is reused until
+    it is REMOTE_FILE_TTL_SECONDS old or pushed out by newer uploads, then
+    deleted remotely in the background; close() deletes whatever is left.
+    Callers hold a file from acquire() until release(), and a file is only
+    deleted once nobody holds it, so expiry or eviction never removes a file
+    a request is still sending to the model.
+    `upload(path)` and `delete(remote)` are blocking SDK calls and run on
+    the provider I/O pool.
+    """
+
+    def __init__(self, upload, delete, ttl=REMOTE_FILE_TTL_SECONDS, max_entries=REMOTE_FILE_MAX_ENTRIES):
+        self.upload = upload
+        self.delete = delete
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # digest -> _Entry
+        self._held = {}  # id(remote) -> _Entry, for entries with users
+        self._uploading = {}
+        self._deleting = set()
+        self.stats = {"uploads": 0, "reused": 0, "deleted": 0, "delete_errors": 0}
+
+    async def acquire(self, path):
+        """Remote file for the content at `path`, uploading it if needed. Pass it to release() when done."""
+        self._expire()
+        digest = await run_blocking(file_digest, path)
+        while True:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.stats["reused"] += 1
+            elif digest in self._uploading:
+                self.stats["reused"] += 1
+                entry = await asyncio.shield(self._uploading[digest])
+            else:
+                task = asyncio.ensure_future(self._upload(digest, path))
+                self._uploading[digest] = task
+                try:
+                    entry = await asyncio.shield(task)
+                finally:
+                    del self._uploading[digest]
+            # Evicted by other uploads before this caller resumed: its deletion is already under way
+            if not (entry.retired and entry.users == 0):
+                break
+        entry.users += 1
+        self._held[id(entry.remote)] = entry
+        return entry.remote
+
+    def release(self, remote):
+        entry = self._held.get(id(remote))
+        if entry is None:
+            return
+        entry.users -= 1
+        if entry.users == 0:
+            del self._held[id(remote)]
+            if entry.retired:
+                self._schedule_delete(entry.remote)
+
+    async def _upload(self, digest, path):
+        entry = _Entry(await run_blocking(self.upload, path))
+        self.stats["uploads"] += 1
+        self._entries[digest] = entry
+        while len(self._entries) > self.max_entries:
+            self._retire(self._entries.popitem(last=False)[1])
+        return entry
+
+    def _retire(self, entry):
+        # Entries still in use are deleted by the last release()
+        entry.retired = True
+        if entry.users == 0:
+            self._schedule_delete(entry.remote)
+
+    def _expire(self):
+        cutoff = time.monotonic() - self.ttl
+        for digest, entry in list(self._entries.items()):
+            if entry.uploaded_at < cutoff:
+                del self._entries[digest]
+                self._retire(entry)
+
+    def _schedule_delete(self, remote):
+        task = asyncio.ensure_future(self._delete(remote))
+        self._deleting.add(task)
+        task.add_done_callback(self._deleting.discard)
+
+    async def _delete(self, remote):
+        try:
+            await run_blocking(self.delete, remote)
+            self.stats["deleted"] += 1
+        except Exception as e:
+            logger.warning("deleting remote file failed error=%s", e)
+            self.stats["delete_errors"] += 1
+
+    async def close(self):
+        """Delete every tracked file and wait for pending deletions."""
+        # Files still held are deleted too: nothing will use them after shutdown
+        held = [entry for entry in self._held.values() if entry.retired]
+        self._held.clear()
+        while self._entries:
+            _, entry = self._entries.popitem()
+            self._schedule_delete(entry.remote)
+        for entry in held:
+            self._schedule_delete(entry.remote)
+        if self._deleting:
+            await asyncio.gather(*list(self._deleting), return_exceptions=True)
+
+    def snapshot(self):
+        return {
+            **self.stats, "entries": len(self._entries), "in_use": len(self._held), "pending_deletes": len(self._deleting)
+        }
@@ -0,0 +1,271 @@
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+
+from services import metrics
+
+# Hedging fires a second request at another provider when the first is
+# slower than its recent p95; it trades extra spend for lower tail latency.
+PROVIDER_HEDGING = os.getenv("PROVIDER_HEDGING", "false").lower() in ("1", "true", "yes")
+HEDGE_MIN_DELAY_MS = int(os.getenv("HEDGE_MIN_DELAY_MS", 300))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", 5))
+BREAKER_COOLDOWN_SECONDS = int(os.getenv("BREAKER_COOLDOWN_SECONDS", 30))
+
+LATENCY_WINDOW = 100
+OUTCOME_WINDOW = 50
+EWMA_ALPHA = 0.2
+
+logger = logging.getLogger(__name__)
+
+
+class OperationStats:
+    """Rolling latency and error rate for one (provider, operation) pair."""
+
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.outcomes = deque(maxlen=OUTCOME_WINDOW)
+        self.ewma = None
+
+    def record(self, ok: bool, latency: float):
+        self.outcomes.append(ok)
+        if ok:
+            self.latencies.append(latency)
+            self.ewma = latency if self.ewma is None else EWMA_ALPHA * latency + (1 - EWMA_ALPHA) * self.ewma
+
+    @property
+    def error_rate(self):
+        return self.outcomes.count(False) / len(self.outcomes) if self.outcomes else 0.0
+
+    def percentile(self, pct):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+    def snapshot(self):
+        p50, p95 = self.percentile(50), self.percentile(95)
+        return {
+            "calls": len(self.outcomes),
+            "error_rate": round(self.error_rate, 3),
+            "ewma_ms": round(self.ewma * 1000, 1) if self.ewma is not None else None,
+            "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+            "p95_ms": round(p95 * 1000, 1) if p95 is not None else None,
+        }
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures; after a cooldown lets one probe call through."""
+
+    def __init__(self, threshold=BREAKER_FAILURE_THRESHOLD, cooldown=BREAKER_COOLDOWN_SECONDS):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.probing = False
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allows(self):
+        state = self.state
+        return state == "closed" or (state == "half-open" and not self.probing)
+
+    def before_call(self):
+        if self.state == "half-open":
+            self.probing = True
+
+    def record(self, ok: bool):
+        if ok:
+            self.failures = 0
+            self.opened_at = None
+        else:
+            self.failures += 1
+            if self.state == "half-open" or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+        self.probing = False
+
+
+class ProviderRouter:
+    """Routes provider calls across service modules by health and latency.
+
+    Exposes the same async interface as the service modules, so it can stand
+    in for `ai_service`. Identity attributes (PROVIDER, MODEL_NAME, target
+    language resolution) come from the preferred provider, which keeps cache
+    keys stable when a call is served by a fallback.
+    """
+
+    def __init__(self, providers, preferred, hedging=PROVIDER_HEDGING, hedge_min_delay_ms=HEDGE_MIN_DELAY_MS,
+                 admission=None):
+        self.providers = list(providers)
+        # Optional `async admission(op, args)` awaited before each call; it may raise to refuse the call
+        self.admission = admission
+        self.preferred = preferred
+        self.hedging = hedging
+        self.hedge_min_delay = hedge_min_delay_ms / 1000
+        self.breakers = {p.PROVIDER: CircuitBreaker() for p in self.providers}
+        self.stats = {}
+        self.counters = {"hedged": 0, "hedge_wins": 0, "failovers": 0}
+
+        self.PROVIDER = preferred.PROVIDER
+        self.MODEL_NAME = preferred.MODEL_NAME
+        self.TTS_VOICE = preferred.TTS_VOICE
+        self.resolve_target_language = preferred.resolve_target_language
+        self.tts_language_code = preferred.tts_language_code
+
+    def _stats(self, provider, op):
+        key = (provider.PROVIDER, op)
+        if key not in self.stats:
+            self.stats[key] = OperationStats()
+        return self.stats[key]
+
+    def ranked(self, op):
+        """Providers for `op` whose breakers allow a call, lowest error-weighted latency first."""
+        def score(provider):
+            stats = self._stats(provider, op)
+            if stats.ewma is None:
+                # No data yet: keep the configured preference until failover or hedging measures it
+                return 0.0 if provider is self.preferred else float("inf")
+            return stats.ewma * (1 + 4 * stats.error_rate)
+        # Not every provider implements every operation, and an open breaker
+        # (or a half-open one already probing) must not be called at all
+        return sorted(
+            (p for p in self.providers if hasattr(p, op) and self.breakers[p.PROVIDER].allows()), key=score
+        )
+
+    async def _attempt(self, provider, op, *args):
+        breaker = self.breakers[provider.PROVIDER]
+        breaker.before_call()
+        start = time.perf_counter()
+        try:
+            result = await getattr(provider, op)(*args)
+        except asyncio.CancelledError:
+            # Lost a hedge race; not the provider's fault
+            breaker.probing = False
+            raise
+        except Exception as e:
+            logger.warning("provider call failed provider=%s op=%s error=%s", provider.PROVIDER, op, e)
+            result = None
+        ok = result is not None
+        elapsed = time.perf_counter() - start
+        breaker.record(ok)
+        self._stats(provider, op).record(ok, elapsed)
+        metrics.record_provider_call(provider.PROVIDER, op, ok, elapsed)
+        return result
+
+    async def _call(self, op, *args):
+        candidates = self.ranked(op)
+        if candidates and self.admission:
+            await self.admission(op, args)
+            # Breakers may have opened while the call queued for budget
+            candidates = self.ranked(op)
+        if not candidates:
+            return None
+        primary = candidates[0]
+        backup = candidates[1] if len(candidates) > 1 else None
+        if backup is None or not self.hedging:
+            result = await self._attempt(primary, op, *args)
+            if result is None and backup is not None:
+                self.counters["failovers"] += 1
+                result = await self._attempt(backup, op, *args)
+            return result
+
+        p95 = self._stats(primary, op).percentile(95)
+        delay = max(self.hedge_min_delay, p95 or 0.0)
+        first = asyncio.ensure_future(self._attempt(primary, op, *args))
+        second = None
+        try:
+            done, _ = await asyncio.wait({first}, timeout=delay)
+            if done and first.result() is not None:
+                return first.result()
+
+            if done:
+                self.counters["failovers"] += 1
+            else:
+                self.counters["hedged"] += 1
+            second = asyncio.ensure_future(self._attempt(backup, op, *args))
+            pending = {second} if done else {first, second}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result() is not None:
+                        if task is second and not first.done():
+                            self.counters["hedge_wins"] += 1
+                        return task.result()
+            return None
+        finally:
+            # Also when the caller is cancelled mid-wait: nobody would await these
+            for task in (first, second):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _stream(self, op, *args):
+        candidates = self.ranked(op)
+        if candidates and self.admission:
+            await self.admission(op, args)
+            candidates = self.ranked(op)
+        if not candidates:
+            raise RuntimeError(f"No provider available for {op}")
+        for index, provider in enumerate(candidates):
+            breaker = self.breakers[provider.PROVIDER]
+            breaker.before_call()
+            start = time.perf_counter()
+            started = False
+            try:
+                async for chunk in getattr(provider, op)(*args):
+                    started = True
+                    yield chunk
+            except Exception:
+                elapsed = time.perf_counter() - start
+                breaker.record(False)
+                self._stats(provider, op).record(False, elapsed)
+                metrics.record_provider_call(provider.PROVIDER, op, False, elapsed)
+                # Fail over only if nothing has been sent to the client yet
+                if started or index == len(candidates) - 1:
+                    raise
+                self.counters["failovers"] += 1
+                continue
+            finally:
+                # The consumer may stop early (cancelled or closed) without an outcome
+                # being recorded; a half-open breaker must not stay stuck probing
+                breaker.probing = False
+            elapsed = time.perf_counter() - start
+            breaker.record(True)
+            self._stats(provider, op).record(True, elapsed)
+            metrics.record_provider_call(provider.PROVIDER, op, True, elapsed)
+            return
+
+    async def translate_text_async(self, text, target_language, reference=None):
+        return await self._call("translate_text_async", text, target_language, reference)
+
+    async def translate_batch_async(self, texts, target_language):
+        return await self._call("translate_batch_async", texts, target_language)
+
+    async def transcribe_audio_async(self, audio_file_path):
+        return await self._call("transcribe_audio_async", audio_file_path)
+
+    async def transcribe_and_translate_async(self, audio_file_path, target_language):
+        return await self._call("transcribe_and_translate_async", audio_file_path, target_language)
+
+    async def text_to_speech_async(self, text, language='en'):
+        return await self._call("text_to_speech_async", text, language)
+
+    def translate_text_stream(self, text, target_language):
+        return self._stream("translate_text_stream", text, target_language)
+
+    def text_to_speech_stream(self, text, language='en'):
+        return self._stream("text_to_speech_stream", text, language)
+
+    def snapshot(self):
+        return {
+            **self.counters,
+            "hedging": self.hedging,
+            "breakers": {name: breaker.state for name, breaker in self.breakers.items()},
+            "operations": {f"{name}.{op}": stats.snapshot() for (name, op), stats in self.stats.items()},
+        }
@@ -0,0 +1,38 @@
+import asyncio
+
+
+class SingleFlight:
+    """Collapse concurrent identical provider calls into one.
+
+    The first caller for a key starts the call as its own task; callers that
+    arrive while it is still running await the same task instead of issuing
+    another upstream request. Nothing is retained once the call finishes, so
+    there is no staleness: later callers always trigger a fresh call.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.stats = {"calls": 0, "coalesced": 0}
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every waiter was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key, func):
+        """Return the result of `await func()`, shared with concurrent callers using the same key."""
+        task = self._calls.get(key)
+        if task is not None:
+            self.stats["coalesced"] += 1
+        else:
+            self.stats["calls"] += 1
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        # Shield so one caller disconnecting does not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def snapshot(self):
+        return {**self.stats, "in_flight": len(self._calls)}
@@ -0,0 +1,66 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+# Budget for `import main` (what a serverless cold start pays before serving), in ms
+BUDGET_MS = int(os.getenv("COLD_START_BUDGET_MS", 1500))
+# Loaded on first use only, whichever provider is selected
+DEFERRED_MODULES = ["google.generativeai", "openai", "gtts", "PIL"]
+
+
+def profile_import(provider):
+    """Import main in a fresh interpreter with -X importtime; returns ({module: cumulative ms}, top-level modules)."""
+    env = {**os.environ, "AI_PROVIDER": provider}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import main failed:\n{result.stderr[-2000:]}")
+    cumulative, top_level = {}, []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, total, name = line[len("import time:"):].split("|")
+        if not total.strip().isdigit():
+            continue
+        module = name.strip()
+        cumulative[module] = int(total) / 1000
+        # Direct imports of main are indented one level below it
+        if name.startswith("   ") and not name.startswith("    "):
+            top_level.append(module)
+    return cumulative, top_level
+
+
+def test_cold_start():
+    failures = []
+    for provider in ("gemini", "openai"):
+        print(f"\nAI_PROVIDER={provider}")
+        cumulative, top_level = profile_import(provider)
+        total = cumulative["main"]
+        print(f"   import main: {total:.0f}ms (budget {BUDGET_MS}ms)")
+        slowest = sorted(top_level, key=lambda m: cumulative[m], reverse=True)[:8]
+        print("   slowest imports: " + ", ".join(f"{m} {cumulative[m]:.0f}ms" for m in slowest))
+        if total > BUDGET_MS:
+            failures.append(f"{provider}: import took {total:.0f}ms, budget is {BUDGET_MS}ms")
+        loaded = [m for m in DEFERRED_MODULES if m in cumulative]
+        if loaded:
+            failures.append(f"{provider}: imported at startup: {', '.join(loaded)}")
+        else:
+            print(f"   deferred: {', '.join(DEFERRED_MODULES)}")
+
+    if failures:
+        print("\nFAILED")
+        for failure in failures:
+            print(f"   {failure}")
+    else:
+        print("\nCold start within budget.")
+    assert not failures, failures
+
+
+if __name__ == "__main__":
+    try:
+        test_cold_start()
+    except AssertionError:
+        sys.exit(1)
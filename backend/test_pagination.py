@@ -0,0 +1,91 @@
+import datetime
+import os
+import tempfile
+
+import pagination
+
+
+def test_cursor_round_trip():
+    timestamp = datetime.datetime(2024, 5, 1, 12, 30, 15, 123456)
+    cursor = pagination.encode_cursor(timestamp, 42)
+    assert "=" not in cursor
+    assert pagination.decode_cursor(cursor) == (timestamp, 42)
+
+
+def test_offset_cursor_round_trip():
+    assert pagination.decode_offset_cursor(pagination.encode_offset_cursor(0)) == 0
+    assert pagination.decode_offset_cursor(pagination.encode_offset_cursor(120)) == 120
+
+
+def test_malformed_cursors_raise_value_error():
+    keyset = pagination.encode_cursor(datetime.datetime(2024, 1, 1), 1)
+    offset = pagination.encode_offset_cursor(10)
+    for decode, cursor in [
+        (pagination.decode_cursor, "zzz"),
+        (pagination.decode_cursor, offset),
+        (pagination.decode_offset_cursor, "zzz"),
+        (pagination.decode_offset_cursor, keyset),
+        (pagination.decode_offset_cursor, pagination.encode_offset_cursor(-1)),
+    ]:
+        try:
+            decode(cursor)
+        except ValueError:
+            continue
+        raise AssertionError(f"{decode.__name__}({cursor!r}) should raise ValueError")
+
+
+def test_etag_depends_on_every_part():
+    assert pagination.make_etag(1, 10, 50) == pagination.make_etag(1, 10, 50)
+    assert pagination.make_etag(1, 10, 50) != pagination.make_etag(1, 11, 50)
+    assert pagination.make_etag(1, 10, None) != pagination.make_etag(1, 10, 50)
+
+
+def test_history_pages_cover_every_row_once():
+    """Walks /history by cursor over rows sharing timestamps: no row is skipped or repeated."""
+    directory = tempfile.mkdtemp(prefix="test_pagination_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(directory, 'history.db')}"
+    os.environ.setdefault("BCRYPT_ROUNDS", "4")
+    os.environ.setdefault("PASSWORD_HASH_EXECUTOR", "thread")
+    os.environ.setdefault("RATE_LIMIT_USER_PER_MINUTE", "0")
+    from fastapi.testclient import TestClient
+    import database
+    import main
+    import models
+
+    with TestClient(main.app) as client:
+        credentials = {"username": "pages@example.com", "password": "pw"}
+        client.post("/users", data=credentials)
+        token = client.post("/token", data=credentials).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        db = database.SessionLocal()
+        try:
+            user_id = db.query(models.User.id).filter(models.User.email == credentials["username"]).scalar()
+            base = datetime.datetime(2024, 1, 1)
+            for i in range(23):
+                db.add(models.TranslationHistory(
+                    user_id=user_id, input_type="text", source_language="English", target_language="Hindi",
+                    original_content=f"row {i}", translated_content=f"[Hindi] row {i}",
+                    # Three rows per timestamp, so pages must break ties by id
+                    timestamp=base + datetime.timedelta(seconds=i // 3),
+                ))
+            db.commit()
+        finally:
+            db.close()
+
+        everything = client.get("/history", headers=headers)
+        assert len(everything.json()) == 23 and "x-next-cursor" not in everything.headers
+
+        seen, cursor = [], None
+        while True:
+            params = {"limit": 5, **({"cursor": cursor} if cursor else {})}
+            response = client.get("/history", params=params, headers=headers)
+            assert response.status_code == 200
+            seen.extend(row["id"] for row in response.json())
+            cursor = response.headers.get("x-next-cursor")
+            if not cursor:
+                break
+        assert seen == [row["id"] for row in everything.json()]
+        assert len(set(seen)) == 23
+
+        assert client.get("/history", params={"cursor": "zzz"}, headers=headers).status_code == 400
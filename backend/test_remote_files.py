@@ -0,0 +1,130 @@
+import asyncio
+import os
+import tempfile
+import time
+
+from services.remote_files import RemoteFileCache
+
+
+class FakeProvider:
+    """Blocking upload/delete pair like the SDK's, recording what it was asked to do."""
+
+    def __init__(self, upload_delay=0.0):
+        self.upload_delay = upload_delay
+        self.uploads = []
+        self.deleted = []
+
+    def upload(self, path):
+        time.sleep(self.upload_delay)
+        with open(path) as f:
+            self.uploads.append(f.read())
+        return f"files/{len(self.uploads)}"
+
+    def delete(self, remote):
+        self.deleted.append(remote)
+
+
+def write_temp(directory, name, content):
+    path = os.path.join(directory, name)
+    with open(path, "w") as f:
+        f.write(content)
+    return path
+
+
+async def settle(cache):
+    # Deletions run as background tasks on the provider I/O pool
+    for _ in range(3):
+        await asyncio.sleep(0.01)
+        if cache._deleting:
+            await asyncio.gather(*list(cache._deleting))
+
+
+def test_same_content_uploaded_once():
+    async def scenario():
+        with tempfile.TemporaryDirectory() as directory:
+            provider = FakeProvider(upload_delay=0.05)
+            cache = RemoteFileCache(provider.upload, provider.delete)
+            first = write_temp(directory, "a.wav", "audio")
+            second = write_temp(directory, "b.wav", "audio")
+            remotes = await asyncio.gather(*[cache.acquire(path) for path in (first, second, first)])
+            assert set(remotes) == {"files/1"}
+            assert provider.uploads == ["audio"]
+            assert cache.snapshot()["in_use"] == 1
+            for remote in remotes:
+                cache.release(remote)
+            assert cache.snapshot()["in_use"] == 0
+            await settle(cache)
+            assert provider.deleted == []
+
+    asyncio.run(scenario())
+
+
+def test_evicted_file_deleted_after_last_release():
+    async def scenario():
+        with tempfile.TemporaryDirectory() as directory:
+            provider = FakeProvider()
+            cache = RemoteFileCache(provider.upload, provider.delete, max_entries=1)
+            a = write_temp(directory, "a.wav", "a")
+            held = [await cache.acquire(a), await cache.acquire(a)]
+            other = await cache.acquire(write_temp(directory, "b.wav", "b"))
+            await settle(cache)
+            assert provider.deleted == []
+            cache.release(held[0])
+            await settle(cache)
+            assert provider.deleted == []
+            cache.release(held[1])
+            await settle(cache)
+            assert provider.deleted == [held[0]]
+            cache.release(other)
+            await settle(cache)
+            # Still cached, so still kept
+            assert provider.deleted == [held[0]]
+
+    asyncio.run(scenario())
+
+
+def test_expired_file_deleted_after_release():
+    async def scenario():
+        with tempfile.TemporaryDirectory() as directory:
+            provider = FakeProvider()
+            cache = RemoteFileCache(provider.upload, provider.delete, ttl=0.05)
+            a = write_temp(directory, "a.wav", "a")
+            remote = await cache.acquire(a)
+            await asyncio.sleep(0.1)
+            # Expiry runs on the next acquire, which uploads a fresh copy
+            fresh = await cache.acquire(a)
+            assert fresh != remote
+            await settle(cache)
+            assert provider.deleted == []
+            cache.release(remote)
+            await settle(cache)
+            assert provider.deleted == [remote]
+            cache.release(fresh)
+
+    asyncio.run(scenario())
+
+
+def test_release_of_unknown_file_is_ignored():
+    async def scenario():
+        provider = FakeProvider()
+        cache = RemoteFileCache(provider.upload, provider.delete)
+        cache.release("files/never-acquired")
+        await settle(cache)
+        assert provider.deleted == []
+
+    asyncio.run(scenario())
+
+
+def test_close_deletes_everything():
+    async def scenario():
+        with tempfile.TemporaryDirectory() as directory:
+            provider = FakeProvider()
+            cache = RemoteFileCache(provider.upload, provider.delete, max_entries=1)
+            evicted = await cache.acquire(write_temp(directory, "a.wav", "a"))
+            cached = await cache.acquire(write_temp(directory, "b.wav", "b"))
+            cache.release(cached)
+            await cache.close()
+            assert sorted(provider.deleted) == sorted([evicted, cached])
+            assert cache.snapshot()["entries"] == 0 and cache.snapshot()["in_use"] == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,131 @@
+import asyncio
+import types
+
+from services.router import ProviderRouter
+
+
+def make_provider(name, delay=0.0, fail=False):
+    """Stand-in service module whose translate call sleeps `delay` and records cancellations."""
+    provider = types.SimpleNamespace(
+        PROVIDER=name, MODEL_NAME=name, TTS_VOICE=None,
+        resolve_target_language=lambda target: target, tts_language_code=lambda language: language,
+        calls=0, cancelled=0, fail=fail,
+    )
+
+    async def translate_text_async(text, target_language, reference=None):
+        provider.calls += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            provider.cancelled += 1
+            raise
+        if provider.fail:
+            raise RuntimeError("provider down")
+        return f"{name}:{text}"
+
+    async def translate_text_stream(text, target_language):
+        for word in text.split():
+            await asyncio.sleep(0.01)
+            yield word
+
+    provider.translate_text_async = translate_text_async
+    provider.translate_text_stream = translate_text_stream
+    return provider
+
+
+def test_open_breaker_is_skipped():
+    async def scenario():
+        down, up = make_provider("down", fail=True), make_provider("up")
+        router = ProviderRouter([down, up], down)
+        router.breakers["down"].threshold = 1
+        assert await router.translate_text_async("x", "y") == "up:x"
+        assert router.breakers["down"].state == "open"
+        assert [p.PROVIDER for p in router.ranked("translate_text_async")] == ["up"]
+        assert await router.translate_text_async("x", "y") == "up:x"
+        assert down.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_no_provider_left():
+    async def scenario():
+        down = make_provider("down", fail=True)
+        router = ProviderRouter([down], down)
+        router.breakers["down"].threshold = 1
+        assert await router.translate_text_async("x", "y") is None
+        assert await router.translate_text_async("x", "y") is None
+        assert down.calls == 1
+        try:
+            async for _ in router.translate_text_stream("x", "y"):
+                pass
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("stream with no provider should raise")
+
+    asyncio.run(scenario())
+
+
+def test_half_open_allows_one_probe():
+    async def scenario():
+        slow = make_provider("slow", delay=0.1)
+        router = ProviderRouter([slow], slow)
+        breaker = router.breakers["slow"]
+        breaker.opened_at, breaker.cooldown = 0, 0
+        assert breaker.state == "half-open"
+        probe = asyncio.ensure_future(router.translate_text_async("x", "y"))
+        await asyncio.sleep(0.01)
+        # Only the probe may reach a half-open provider
+        assert await router.translate_text_async("x", "y") is None
+        assert await probe == "slow:x"
+        assert breaker.state == "closed" and not breaker.probing
+        assert slow.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_closed_stream_releases_probe():
+    async def scenario():
+        provider = make_provider("p")
+        router = ProviderRouter([provider], provider)
+        breaker = router.breakers["p"]
+        breaker.opened_at, breaker.cooldown = 0, 0
+        stream = router.translate_text_stream("one two three", "y")
+        assert await stream.__anext__() == "one"
+        assert breaker.probing
+        await stream.aclose()
+        assert not breaker.probing and breaker.allows()
+
+    asyncio.run(scenario())
+
+
+def test_hedge_wins_and_cancels_loser():
+    async def scenario():
+        slow, fast = make_provider("slow", delay=1), make_provider("fast", delay=0.01)
+        router = ProviderRouter([slow, fast], slow, hedging=True, hedge_min_delay_ms=50)
+        assert await router.translate_text_async("x", "y") == "fast:x"
+        await asyncio.sleep(0.01)
+        assert router.counters["hedged"] == 1 and router.counters["hedge_wins"] == 1
+        assert slow.cancelled == 1
+        # Losing a hedge race is not the provider's fault
+        assert router.breakers["slow"].failures == 0 and not router.breakers["slow"].probing
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_cancels_primary_before_hedge():
+    async def scenario():
+        slow, backup = make_provider("slow", delay=5), make_provider("backup")
+        router = ProviderRouter([slow, backup], slow, hedging=True, hedge_min_delay_ms=1000)
+        call = asyncio.ensure_future(router.translate_text_async("x", "y"))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        try:
+            await call
+        except asyncio.CancelledError:
+            pass
+        await asyncio.sleep(0.01)
+        assert slow.cancelled == 1
+        assert backup.calls == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,151 @@
+import datetime
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Optional
+
+import models
+
+CACHE_MEMORY_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MEMORY_ENTRIES", 2048))
+CACHE_PERSISTENT_ENTRIES = int(os.getenv("TRANSLATION_CACHE_PERSISTENT_ENTRIES", 100000))
+CACHE_TTL_SECONDS = int(os.getenv("TRANSLATION_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+# Run TTL/size eviction on the persistent tier once every N writes
+CACHE_PRUNE_EVERY = int(os.getenv("TRANSLATION_CACHE_PRUNE_EVERY", 200))
+
+logger = logging.getLogger(__name__)
+
+_spaces = re.compile(r"[ \t]+")
+
+def normalize_text(text: str) -> str:
+    """NFC-normalize, trim, and collapse runs of spaces and tabs so trivially different inputs share a key.
+
+    Newlines are kept: line breaks survive into the translation, so texts
+    differing only in them must not share a cached result.
+    """
+    return _spaces.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+def make_key(text: str, target_language: str, provider: str, model_name: str) -> str:
+    """Content address for a translation.
+
+    `target_language` should already be resolved by the provider
+    (see `resolve_target_language` in the service modules).
+    """
+    raw = "\x1f".join([normalize_text(text), target_language, provider, model_name])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """Two-tier translation cache: an in-process LRU in front of a SQL table."""
+
+    def __init__(self, session_factory, memory_entries=CACHE_MEMORY_ENTRIES,
+                 persistent_entries=CACHE_PERSISTENT_ENTRIES, ttl_seconds=CACHE_TTL_SECONDS):
+        self.session_factory = session_factory
+        self.memory_entries = memory_entries
+        self.persistent_entries = persistent_entries
+        self.ttl_seconds = ttl_seconds
+        self._lru = OrderedDict()  # key -> (expires_at, translated_text)
+        self._lock = threading.Lock()
+        self._writes_since_prune = 0
+        self.stats = {"memory_hits": 0, "persistent_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _remember(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._lru[key] = (expires_at, value)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.memory_entries:
+                self._lru.popitem(last=False)
+
+    def get_memory(self, key: str) -> Optional[str]:
+        """Hot-tier lookup only; never touches the database."""
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if entry[0] > time.time():
+                    self._lru.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    return entry[1]
+                del self._lru[key]
+        return None
+
+    def get_persistent(self, key: str) -> Optional[str]:
+        """Shared-tier lookup; promotes hits into the LRU."""
+        try:
+            db = self.session_factory()
+            try:
+                row = db.get(models.TranslationCacheEntry, key)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning("translation cache read failed error=%s", e)
+            self.stats["errors"] += 1
+            row = None
+
+        if row is not None:
+            expires_at = row.created_at.replace(tzinfo=datetime.timezone.utc).timestamp() + self.ttl_seconds
+            if expires_at > time.time():
+                self._remember(key, row.translated_content, expires_at)
+                self.stats["persistent_hits"] += 1
+                return row.translated_content
+
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, value: str, provider: str, model_name: str, target_language: str):
+        self.set_many([(key, value, provider, model_name, target_language)])
+
+    def set_many(self, entries):
+        """Store (key, value, provider, model_name, target_language) tuples in one transaction."""
+        expires_at = time.time() + self.ttl_seconds
+        for key, value, *_ in entries:
+            self._remember(key, value, expires_at)
+        try:
+            db = self.session_factory()
+            try:
+                now = datetime.datetime.utcnow()
+                for key, value, provider, model_name, target_language in entries:
+                    db.merge(models.TranslationCacheEntry(
+                        key=key,
+                        provider=provider,
+                        model_name=model_name,
+                        target_language=target_language,
+                        translated_content=value,
+                        created_at=now,
+                    ))
+                db.commit()
+                self.stats["stores"] += len(entries)
+                self._writes_since_prune += len(entries)
+                if self._writes_since_prune >= CACHE_PRUNE_EVERY:
+                    self._writes_since_prune = 0
+                    self._prune(db)
+            finally:
+                db.close()
+        except Exception as e:
+            logger.warning("translation cache write failed error=%s", e)
+            self.stats["errors"] += 1
+
+    def _prune(self, db):
+        """Drop expired rows, then the oldest rows beyond the size bound."""
+        Entry = models.TranslationCacheEntry
+        cutoff = datetime.datetime.utcnow() - datetime.timedelta(seconds=self.ttl_seconds)
+        db.query(Entry).filter(Entry.created_at < cutoff).delete(synchronize_session=False)
+        excess = db.query(Entry).count() - self.persistent_entries
+        if excess > 0:
+            oldest = db.query(Entry.key).order_by(Entry.created_at.asc()).limit(excess)
+            db.query(Entry).filter(Entry.key.in_(oldest.scalar_subquery())).delete(synchronize_session=False)
+        db.commit()
+
+    def snapshot(self):
+        with self._lock:
+            memory_size = len(self._lru)
+        lookups = self.stats["memory_hits"] + self.stats["persistent_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "memory_size": memory_size,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+        }
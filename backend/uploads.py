@@ -0,0 +1,87 @@
+import io
+import os
+import tempfile
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
+
+from services import metrics
+
+MB = 1024 * 1024
+MAX_AUDIO_UPLOAD_BYTES = int(os.getenv("MAX_AUDIO_UPLOAD_MB", 25)) * MB
+MAX_IMAGE_UPLOAD_BYTES = int(os.getenv("MAX_IMAGE_UPLOAD_MB", 10)) * MB
+# Longest image side sent to the vision model; larger images only cost
+# upload time and tokens without improving OCR.
+IMAGE_MAX_SIDE = int(os.getenv("IMAGE_MAX_SIDE", 1536))
+IMAGE_JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", 85))
+UPLOAD_CHUNK_BYTES = 1 * MB
+UPLOAD_DIR = "/tmp" if os.environ.get("VERCEL") else tempfile.gettempdir()
+
+
+def _too_large(max_bytes: int):
+    return HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes // MB} MB limit")
+
+
+def check_size(file: UploadFile, max_bytes: int):
+    """Reject early when the multipart parser already knows the upload is too big."""
+    if file.size is not None and file.size > max_bytes:
+        raise _too_large(max_bytes)
+
+
+@asynccontextmanager
+async def spooled_upload(file: UploadFile, max_bytes: int = MAX_AUDIO_UPLOAD_BYTES):
+    """Stream an upload to a uniquely named temp file and yield its path.
+
+    The file keeps the upload's extension (providers sniff the MIME type from
+    it) and is always removed when the block exits.
+    """
+    check_size(file, max_bytes)
+    suffix = os.path.splitext(file.filename or "")[1][:16]
+    fd, path = tempfile.mkstemp(prefix="upload_", suffix=suffix, dir=UPLOAD_DIR)
+    try:
+        size = 0
+        with metrics.stage("upload_spool"), os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                await run_in_threadpool(out.write, chunk)
+        yield path
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def decode_image(fp, max_side: int = IMAGE_MAX_SIDE):
+    """Decode an image at (roughly) the resolution the model needs, as RGB.
+
+    JPEG sources are decoded directly at reduced scale via `draft`, so a
+    12 MP phone photo never materializes at full size. Raises
+    HTTPException(400) for undecodable input.
+    """
+    # Pillow is imported on the first image request rather than at cold start
+    import PIL.Image
+    import PIL.ImageOps
+    try:
+        image = PIL.Image.open(fp)
+        image.draft("RGB", (max_side, max_side))
+        image = PIL.ImageOps.exif_transpose(image)
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        image.thumbnail((max_side, max_side))
+    except (PIL.UnidentifiedImageError, OSError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid image")
+    return image
+
+
+def encode_image(image, quality: int = IMAGE_JPEG_QUALITY):
+    """Gemini inline-data dict holding `image` recompressed as JPEG."""
+    out = io.BytesIO()
+    image.save(out, format="JPEG", quality=quality, optimize=True)
+    return {"mime_type": "image/jpeg", "data": out.getvalue()}
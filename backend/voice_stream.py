@@ -0,0 +1,137 @@
+import io
+import math
+import os
+import tempfile
+import wave
+from array import array
+
+# Live voice input is raw 16-bit little-endian mono PCM, split into segments at pauses
+VOICE_FRAME_MS = int(os.getenv("VOICE_FRAME_MS", 30))
+VOICE_SILENCE_MS = int(os.getenv("VOICE_SILENCE_MS", 600))
+VOICE_MIN_SPEECH_MS = int(os.getenv("VOICE_MIN_SPEECH_MS", 250))
+VOICE_MAX_SEGMENT_MS = int(os.getenv("VOICE_MAX_SEGMENT_MS", 15000))
+VOICE_PREROLL_MS = int(os.getenv("VOICE_PREROLL_MS", 200))
+# RMS level below which a frame is always silence; the adaptive noise floor can raise it
+VOICE_ENERGY_THRESHOLD = int(os.getenv("VOICE_ENERGY_THRESHOLD", 300))
+SAMPLE_RATES = (8000, 16000, 22050, 24000, 32000, 44100, 48000)
+
+NOISE_FLOOR_ALPHA = 0.05
+SPEECH_TO_NOISE = 3.0
+
+
+def frame_rms(frame: bytes):
+    samples = array("h", frame)
+    if not samples:
+        return 0.0
+    return math.sqrt(sum(s * s for s in samples) / len(samples))
+
+
+class Segmenter:
+    """Energy-based voice activity detector that cuts a PCM stream into utterances.
+
+    feed() takes arbitrary-sized chunks and returns the segments completed by
+    them. A segment ends after VOICE_SILENCE_MS of silence, or at
+    VOICE_MAX_SEGMENT_MS so long monologues still produce partial results.
+    Segments with less than VOICE_MIN_SPEECH_MS of speech (clicks, coughs)
+    are discarded.
+    """
+
+    def __init__(self, sample_rate=16000, frame_ms=VOICE_FRAME_MS, silence_ms=VOICE_SILENCE_MS,
+                 min_speech_ms=VOICE_MIN_SPEECH_MS, max_segment_ms=VOICE_MAX_SEGMENT_MS,
+                 preroll_ms=VOICE_PREROLL_MS, threshold=VOICE_ENERGY_THRESHOLD):
+        self.sample_rate = sample_rate
+        self.frame_ms = frame_ms
+        self.frame_bytes = sample_rate * frame_ms // 1000 * 2
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.max_frames = max(1, max_segment_ms // frame_ms)
+        self.preroll_frames = preroll_ms // frame_ms
+        self.threshold = threshold
+        self.noise_floor = None
+        self._pending = b""
+        self._preroll = []
+        self._frames = []
+        self._speech_frames = 0
+        self._trailing_silence = 0
+
+    @property
+    def in_speech(self):
+        return bool(self._frames)
+
+    def is_speech(self, frame):
+        rms = frame_rms(frame)
+        floor = self.noise_floor if self.noise_floor is not None else 0.0
+        speech = rms > max(self.threshold, floor * SPEECH_TO_NOISE)
+        if not speech:
+            self.noise_floor = rms if self.noise_floor is None else (
+                NOISE_FLOOR_ALPHA * rms + (1 - NOISE_FLOOR_ALPHA) * self.noise_floor
+            )
+        return speech
+
+    def feed(self, data: bytes):
+        segments = []
+        data = self._pending + data
+        usable = len(data) - len(data) % self.frame_bytes
+        self._pending = data[usable:]
+        for start in range(0, usable, self.frame_bytes):
+            segment = self._push(data[start:start + self.frame_bytes])
+            if segment:
+                segments.append(segment)
+        return segments
+
+    def flush(self):
+        """End of stream: return the segment in progress, if it holds enough speech."""
+        if self._pending and self._frames:
+            self._frames.append(self._pending)
+        self._pending = b""
+        return self._finish()
+
+    def _push(self, frame):
+        speech = self.is_speech(frame)
+        if not self._frames:
+            if not speech:
+                self._preroll.append(frame)
+                if len(self._preroll) > self.preroll_frames:
+                    self._preroll.pop(0)
+                return None
+            # Keep a little audio from before the onset so the first syllable is not clipped
+            self._frames, self._preroll = self._preroll, []
+        self._frames.append(frame)
+        if speech:
+            self._speech_frames += 1
+            self._trailing_silence = 0
+        else:
+            self._trailing_silence += 1
+        if self._trailing_silence >= self.silence_frames or len(self._frames) >= self.max_frames:
+            return self._finish()
+        return None
+
+    def _finish(self):
+        frames, speech = self._frames, self._speech_frames
+        if self._trailing_silence:
+            frames = frames[:len(frames) - self._trailing_silence]
+        self._frames, self._speech_frames, self._trailing_silence = [], 0, 0
+        if speech < self.min_speech_frames:
+            return None
+        return b"".join(frames)
+
+    def duration_ms(self, pcm: bytes):
+        return len(pcm) * 1000 // (2 * self.sample_rate)
+
+
+def to_wav(pcm: bytes, sample_rate: int):
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm)
+    return buffer.getvalue()
+
+
+def write_temp_wav(pcm: bytes, sample_rate: int):
+    """Write a segment to a uniquely named .wav file for the transcription APIs; the caller removes it."""
+    fd, path = tempfile.mkstemp(suffix=".wav")
+    with os.fdopen(fd, "wb") as f:
+        f.write(to_wav(pcm, sample_rate))
+    return path